@@ -0,0 +1,64 @@
+# encoding: utf-8
+
+'''
+@author: Tsuyoshi Hombashi
+'''
+
+import pytest
+
+from thutils.cache import *
+
+
+class Test_lru_memoize:
+
+    def test_normal(self):
+        call_list = []
+
+        @lru_memoize(maxsize=2)
+        def double(value):
+            call_list.append(value)
+            return value * 2
+
+        assert double(1) == 2
+        assert double(2) == 4
+        assert double(1) == 2
+        assert call_list == [1, 2]
+
+        # 2 is the least recently used
+        assert double(3) == 6
+        assert double(1) == 2
+        assert double(2) == 4
+        assert call_list == [1, 2, 3, 2]
+
+        double.cache_clear()
+        assert double(1) == 2
+        assert call_list == [1, 2, 3, 2, 1]
+
+    def test_normal_unhashable(self):
+        @lru_memoize()
+        def get_len(value):
+            return len(value)
+
+        assert get_len([1, 2]) == 2
+
+    def test_normal_exception(self):
+        call_list = []
+
+        @lru_memoize()
+        def fail(value):
+            call_list.append(value)
+            raise ValueError()
+
+        for _i in range(2):
+            with pytest.raises(ValueError):
+                fail(1)
+
+        assert call_list == [1, 1]
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [0, ValueError],
+        [-1, ValueError],
+    ])
+    def test_exception(self, value, expected):
+        with pytest.raises(expected):
+            lru_memoize(value)
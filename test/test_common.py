@@ -241,3 +241,36 @@ class Test_dump_dict:
     def test_exception(self, value, expected):
         with pytest.raises(expected):
             assert dump_dict(value)
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [
+            {"a": float},
+            """{
+    "a": "%s"
+}""" % (str(float)),
+        ],
+    ])
+    def test_normal_not_serializable(self, value, expected):
+        assert dump_dict(value, indent=4) == expected
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [
+            {"a": 1},
+            """header: {
+    "a": 1
+}""",
+        ],
+    ])
+    def test_normal_lazy(self, value, expected):
+        lazy_dump = "header: " + dump_dict(value, indent=4, lazy=True)
+
+        assert isinstance(lazy_dump, LazyDictDump)
+        assert str(lazy_dump) == expected
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [1, TypeError],
+        [None, TypeError],
+    ])
+    def test_exception_lazy(self, value, expected):
+        with pytest.raises(expected):
+            dump_dict(value, lazy=True)
@@ -0,0 +1,131 @@
+# encoding: utf-8
+
+'''
+@author: Tsuyoshi Hombashi
+'''
+
+import json
+
+import pytest
+import six
+
+import thutils
+from thutils.dumper import *
+from thutils.gfile import FileManager
+from thutils.loader import Compression
+from thutils.loader import JsonLinesLoader
+from thutils.loader import JsonLoader
+
+
+RECORD_LIST = [
+    {"id": 1, "name": six.u("あ")},
+    {"id": 2, "name": "b"},
+]
+
+
+@pytest.fixture
+def file_manager():
+    FileManager.initialize(dry_run=False)
+
+    yield FileManager
+
+    FileManager.initialize(dry_run=False)
+
+
+class Test_JsonDumper:
+
+    @pytest.mark.parametrize(["compression"], [
+        [None],
+        [Compression.GZIP],
+        [Compression.BZIP2],
+        [Compression.XZ],
+    ])
+    def test_normal_array(self, tmpdir, file_manager, compression):
+        if compression == Compression.XZ:
+            pytest.importorskip("lzma")
+
+        p = str(tmpdir.join("out.json"))
+
+        with JsonDumper(p, compression=compression, buffer_size=16) as dumper:
+            dumper.write_all(RECORD_LIST)
+
+        assert dumper.write_count == 2
+        assert JsonLoader.load(
+            p, file_check_mode=JsonLoader.FileCheckMode.SNIFF) == RECORD_LIST
+        assert tmpdir.listdir() == [tmpdir.join("out.json")]
+
+    @pytest.mark.parametrize(["value"], [
+        [[]],
+        [RECORD_LIST],
+    ])
+    def test_normal_json_lines(self, tmpdir, file_manager, value):
+        p = str(tmpdir.join("out.jsonl"))
+
+        with JsonDumper(p, JsonDumper.Format.JSON_LINES) as dumper:
+            dumper.write_all(value)
+
+        assert JsonLinesLoader.load(p) == value
+
+    def test_normal_empty_array(self, tmpdir, file_manager):
+        p = tmpdir.join("out.json")
+
+        JsonDumper(str(p)).close()
+
+        assert json.loads(p.read()) == []
+
+    def test_normal_dry_run(self, tmpdir, file_manager):
+        file_manager.initialize(dry_run=True)
+        p = str(tmpdir.join("out.json"))
+
+        with JsonDumper(p) as dumper:
+            dumper.write_all(RECORD_LIST)
+
+        assert dumper.write_count == 2
+        assert tmpdir.listdir() == []
+
+    def test_abnormal(self, tmpdir, file_manager):
+        p = tmpdir.join("out.json")
+        p.write("[]")
+
+        with pytest.raises(TypeError):
+            with JsonDumper(str(p), buffer_size=1) as dumper:
+                dumper.write(RECORD_LIST[0])
+                dumper.write(object())
+
+        # the existing file is not changed
+        assert p.read() == "[]"
+        assert tmpdir.listdir() == [p]
+
+        with pytest.raises(RuntimeError):
+            dumper.write(RECORD_LIST[0])
+
+    def test_abnormal_close(self, monkeypatch, tmpdir, file_manager):
+        def flush():
+            raise IOError("no space left on device")
+
+        p = tmpdir.join("out.json")
+        dumper = JsonDumper(str(p))
+        dumper.write(RECORD_LIST[0])
+        raw_fp = dumper._JsonDumper__raw_fp
+        monkeypatch.setattr(dumper, "_JsonDumper__flush", flush)
+
+        with pytest.raises(IOError):
+            dumper.close()
+
+        # the temporary file is closed and removed
+        assert raw_fp.closed
+        assert tmpdir.listdir() == []
+
+    @pytest.mark.parametrize(["output_format", "compression", "expected"], [
+        ["invalid", None, ValueError],
+        [JsonDumper.Format.ARRAY, "invalid", ValueError],
+    ])
+    def test_exception(
+            self, tmpdir, file_manager, output_format, compression,
+            expected):
+        with pytest.raises(expected):
+            JsonDumper(str(tmpdir.join("out.json")), output_format, compression)
+
+    def test_exception_dir_not_found(self, tmpdir, file_manager):
+        with pytest.raises(thutils.gfile.FileNotFoundError):
+            JsonDumper(str(tmpdir.join("not_exist", "out.json")))
@@ -4,8 +4,10 @@
 
 import os
 import itertools
+import re
 
 import pytest
+import six
 from path import Path
 
 import thutils.common as common
@@ -123,6 +125,256 @@ class Test_check_file_existence:
             assert check_file_existence(value)
 
 
+class Test_FileTypeChecker:
+
+    @pytest.fixture
+    def checker(self):
+        pytest.importorskip("magic")
+        FileTypeChecker.clear_cache()
+
+        yield FileTypeChecker
+
+        FileTypeChecker.clear_cache()
+
+    def test_normal(self, tmpdir, checker):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write("abc\n")
+
+        assert checker.is_text_file(str(p))
+        assert checker.get_file_type(str(p)) == checker.get_file_type(str(p))
+
+        p.write_binary(six.b("\0\1\2\3" * 100))
+        assert not checker.is_text_file(str(p))
+
+    def test_normal_threads(self, tmpdir, checker):
+        import multiprocessing.pool
+
+        path_list = []
+        for i in range(8):
+            p = tmpdir.join("%d.txt" % (i))
+            p.write("abc\n" * i)
+            path_list.append(str(p))
+
+        pool = multiprocessing.pool.ThreadPool(4)
+        try:
+            result_list = pool.map(checker.get_file_type, path_list)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        assert result_list == [
+            checker.get_file_type(path) for path in path_list]
+
+    @pytest.mark.parametrize(["workers", "use_process", "head_size"], [
+        [None, False, None],
+        [4, False, None],
+        [2, True, None],
+        [4, False, 8],
+    ])
+    def test_normal_iter_file_type(
+            self, tmpdir, checker, workers, use_process, head_size):
+        path_list = []
+        for i in range(20):
+            p = tmpdir.join("%d.txt" % (i))
+            p.write("abc\n" * (i + 1))
+            path_list.append(str(p))
+        not_exist_path = str(tmpdir.join("not_exist"))
+
+        result_table = dict(checker.iter_file_type(
+            iter(path_list + [not_exist_path]), workers, use_process,
+            head_size))
+
+        assert sorted(result_table) == sorted(path_list + [not_exist_path])
+        assert result_table[not_exist_path] is None
+        for path in path_list:
+            assert "text" in result_table[path]
+
+
+class Test_get_stat_key:
+
+    @pytest.mark.skipif("not hasattr(os, 'symlink')")
+    def test_normal(self, tmpdir):
+        import stat
+
+        from thutils.gfile import _get_stat_key
+
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write("abc")
+        link_path = str(tmpdir.join("link"))
+        os.symlink(str(p), link_path)
+
+        stat_key = _get_stat_key(str(p))
+        assert stat_key[2] == 3
+        assert stat_key[-1] == stat.S_IFREG
+        assert _get_stat_key(link_path)[-1] == stat.S_IFLNK
+        assert _get_stat_key(link_path, follow_symlinks=True) == stat_key
+
+        p.write("abcd")
+        assert _get_stat_key(link_path, follow_symlinks=True) != stat_key
+        assert _get_stat_key(str(tmpdir.join("not_exist"))) is None
+
+
+class Test_SignatureFileTypeDetector:
+
+    @pytest.mark.parametrize(["value", "is_truncated", "expected"], [
+        [six.b(""), False, "empty"],
+        [six.b("abc\n"), False, "ASCII text"],
+        [six.b("\x1f\x8b\x08\x00"), False, "gzip compressed data"],
+        [six.b("\x89PNG\r\n\x1a\n\x00"), False, "PNG image data"],
+        [six.b("\x7fELF\x02\x01"), False, "ELF"],
+        [six.b("\0" * 257 + "ustar\0"), False, "POSIX tar archive"],
+        [six.b("\xff\xfea\x00"), False, "UTF-16 Unicode text"],
+        [six.b("abc\0def"), False, "data"],
+        [six.b("\1\2\3abc"), False, "data"],
+        [six.b("\x1b[31mabc\x1b[0m\n"), False, "ASCII text"],
+        [u"\u3042\u3044".encode("utf-8"), False, "UTF-8 Unicode text"],
+        [u"\u3042".encode("utf-8")[:2], True, "UTF-8 Unicode text"],
+        [u"\u3042".encode("utf-8")[:2], False, "ISO-8859 text"],
+        [six.b("caf\xe9\n"), False, "ISO-8859 text"],
+        [six.b("MZ Corp quarterly report\n"), False, "ASCII text"],
+        [six.b("MZ\x90\x00\x03\x00"), False, "MS-DOS executable"],
+        [six.b("BZh! hello\n"), False, "ASCII text"],
+        [six.b("BZh91AY&SY\x00"), False, "bzip2 compressed data"],
+        [six.b("ID3 tags\n"), False, "ASCII text"],
+        [six.b("RIFF notes\n"), False, "ASCII text"],
+    ])
+    def test_normal_buffer(self, value, is_truncated, expected):
+        assert SignatureFileTypeDetector.detect_buffer(
+            value, is_truncated) == expected
+
+    def test_normal(self, tmpdir):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write_binary(six.b("abc") + u"\u3042".encode("utf-8"))
+
+        assert SignatureFileTypeDetector.detect(str(p)) == "UTF-8 Unicode text"
+        assert SignatureFileTypeDetector.detect(str(p), 4) == (
+            "UTF-8 Unicode text")
+        assert SignatureFileTypeDetector.detect(str(tmpdir)) == "directory"
+
+    @pytest.mark.skipif("not hasattr(os, 'symlink')")
+    def test_normal_symlink(self, tmpdir):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write("abc\n")
+        link_path = str(tmpdir.join("link"))
+        os.symlink(str(p), link_path)
+        backend = FileTypeChecker.Backend.SIGNATURE
+
+        FileTypeChecker.clear_cache()
+        try:
+            # links are not followed as well as libmagic, so the result
+            # does not depend on the target
+            expected = "symbolic link to " + str(p)
+            assert FileTypeChecker.get_file_type(
+                link_path, backend=backend) == expected
+
+            p.write_binary(six.b("\0\1\2\3" * 100))
+            assert FileTypeChecker.get_file_type(
+                link_path, backend=backend) == expected
+            assert FileTypeChecker.get_file_type(
+                str(p), backend=backend) == "data"
+        finally:
+            FileTypeChecker.clear_cache()
+
+    @pytest.mark.skipif("not hasattr(os, 'mkfifo')")
+    def test_normal_fifo(self, tmpdir):
+        fifo_path = str(tmpdir.join("fifo"))
+        os.mkfifo(fifo_path)
+
+        # not blocked by opening the fifo
+        assert SignatureFileTypeDetector.detect(fifo_path) == (
+            "fifo (named pipe)")
+
+    def test_normal_backend(self, tmpdir):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write("abc\n")
+        backend = FileTypeChecker.Backend.SIGNATURE
+
+        FileTypeChecker.clear_cache()
+        try:
+            assert FileTypeChecker.is_text_file(str(p), backend=backend)
+
+            p.write_binary(six.b("\0\1\2\3" * 100))
+            assert not FileTypeChecker.is_text_file(str(p), backend=backend)
+
+            result_table = dict(FileTypeChecker.iter_file_type(
+                [str(p)], workers=2, backend=backend))
+            assert result_table == {str(p): "data"}
+        finally:
+            FileTypeChecker.clear_cache()
+
+    def test_exception(self, tmpdir):
+        with pytest.raises(IOError):
+            SignatureFileTypeDetector.detect(str(tmpdir.join("not_exist")))
+        with pytest.raises(ValueError):
+            FileTypeChecker.get_file_type(str(tmpdir), backend="unknown")
+
+
+class Test_findFileAll:
+
+    @pytest.fixture
+    def search_dir(self, tmpdir):
+        tmpdir.join("a.txt").write("")
+        tmpdir.join("b.log").write("")
+        tmpdir.mkdir("sub_a").join("c.txt").write("")
+        sub_b = tmpdir.mkdir("sub_b.txt")
+        sub_b.join("d.txt").write("")
+        sub_b.mkdir("sub_c").join("e.txt").write("")
+
+        return tmpdir
+
+    def __walk(self, root_path, check_func, pattern):
+        # reference implementation
+        return [
+            os.path.join(dir_path, name)
+            for dir_path, dir_name_list, filename_list in os.walk(root_path)
+            for name in dir_name_list + filename_list
+            if check_func(os.path.join(dir_path, name)) and
+            re.search(pattern, name)
+        ]
+
+    @pytest.mark.parametrize(["check_func", "pattern", "expected"], [
+        [
+            os.path.isfile, "txt$",
+            ["a.txt", "sub_a/c.txt", "sub_b.txt/d.txt",
+             "sub_b.txt/sub_c/e.txt"],
+        ],
+        [os.path.isdir, "txt$", ["sub_b.txt"]],
+        [os.path.isdir, "^sub", ["sub_a", "sub_b.txt", "sub_b.txt/sub_c"]],
+        [os.path.exists, "^[ab]", ["a.txt", "b.log"]],
+        [os.path.isfile, "not_match", []],
+    ])
+    def test_normal(self, search_dir, check_func, pattern, expected):
+        root_path = str(search_dir)
+        result = findFileAll(root_path, check_func, pattern)
+
+        assert sorted(result) == sorted([
+            os.path.join(root_path, *path.split("/")) for path in expected])
+        assert result == self.__walk(root_path, check_func, pattern)
+
+    def test_normal_walk(self, monkeypatch, search_dir):
+        import thutils.gfile
+
+        root_path = str(search_dir)
+        expected = findFileAll(root_path, os.path.isfile, "txt$")
+
+        monkeypatch.setattr(thutils.gfile, "_get_scandir", lambda: None)
+        assert findFileAll(root_path, os.path.isfile, "txt$") == expected
+
+    def test_normal_find_count(self, search_dir):
+        root_path = str(search_dir)
+
+        assert findFileAll(root_path, os.path.isfile, "txt$", 2) == (
+            self.__walk(root_path, os.path.isfile, "txt$")[:2])
+        assert findFile(root_path, "c.txt") == os.path.join(
+            root_path, "sub_a", "c.txt")
+        assert findDirectory(root_path, "sub_c") == os.path.join(
+            root_path, "sub_b.txt", "sub_c")
+
+    def test_normal_not_exist(self, tmpdir):
+        assert findFileAll(
+            str(tmpdir.join("not_exist")), os.path.isfile, ".*") == []
+
+
 class Test_parsePermission3Char:
 
     @pytest.mark.parametrize(["value", "expected"], [
@@ -4,7 +4,11 @@
 @author: Tsuyoshi Hombashi
 '''
 
+import datetime
+import sys
+
 import pytest
+import thutils.gtime
 from thutils.gtime import *
 
 
@@ -50,6 +54,15 @@ class Test_convertHumanReadableToSecond:
         ["2w", 2 * 60 ** 2 * 24 * 7], ["2W", 2 * 60 ** 2 * 24 * 7],
         ["123456789 w", 123456789 * 60 ** 2 * 24 * 7],
         ["123456789 W", 123456789 * 60 ** 2 * 24 * 7],
+        ["1h30m15s", 60 ** 2 + 30 * 60 + 15],
+        ["1H 30M 15S", 60 ** 2 + 30 * 60 + 15],
+        ["1.5h", 1.5 * 60 ** 2],
+        [".5m", 30],
+        ["1w2d", 60 ** 2 * 24 * 9],
+        ["+5m", 5 * 60],
+        ["1e3s", 1000],
+        ["1.5E+2s", 150],
+        ["2e-1m", 12],
     ])
     def test_normal(self, value, expected):
         assert convertHumanReadableToSecond(value) == expected
@@ -63,7 +76,503 @@ class Test_convertHumanReadableToSecond:
         ["-1s", ValueError],
         ["1sec", ValueError],
         ["テスト", ValueError],
+        ["1h30", ValueError],
+        ["1h-30m", ValueError],
+        ["1.2.3s", ValueError],
+        ["1es", ValueError],
+        ["infs", ValueError],
+        ["nanm", ValueError],
+        ["+-1s", ValueError],
+        [[], ValueError],
     ])
     def test_abnormal(self, value, expected):
         with pytest.raises(expected):
             convertHumanReadableToSecond(value)
+
+
+class Test_convertHumanReadableToSecondList:
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [["2s", "1m30s", "2s"], [2, 90, 2]],
+        [[], []],
+    ])
+    def test_normal(self, value, expected):
+        assert convertHumanReadableToSecondList(value) == expected
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [["2s", "1x"], ValueError],
+        [None, TypeError],
+    ])
+    def test_exception(self, value, expected):
+        with pytest.raises(expected):
+            convertHumanReadableToSecondList(value)
+
+
+class Test_DateTimeParser:
+
+    @pytest.mark.parametrize(["value", "expected_format"], [
+        ["2016-01-02 03:04:05", Format.ISO.DATETIME],
+        ["20160102T030405", Format.ISO8601.Basic.DATETIME],
+        ["2016/01/02 03:04:05", "%Y/%m/%d %H:%M:%S"],
+        ["2016/1/2 3:4:5", "%Y/%m/%d %H:%M:%S"],
+    ])
+    def test_normal(self, value, expected_format):
+        parser = DateTimeParser()
+
+        assert parser.parse(value) == datetime.datetime(2016, 1, 2, 3, 4, 5)
+        assert parser.last_format == expected_format
+
+    @pytest.mark.skipif("sys.version_info < (3, 2)")
+    @pytest.mark.parametrize(["value", "expected_offset"], [
+        ["2016-01-02T03:04:05+0900", datetime.timedelta(hours=9)],
+        ["2016-01-02T03:04:05-0130", -datetime.timedelta(minutes=90)],
+    ])
+    def test_normal_timezone(self, value, expected_offset):
+        parser = DateTimeParser()
+        dt = parser.parse(value)
+
+        assert dt.replace(tzinfo=None) == datetime.datetime(
+            2016, 1, 2, 3, 4, 5)
+        assert dt.utcoffset() == expected_offset
+        assert parser.last_format == Format.ISO8601.Extended.DATETIME
+
+    def test_normal_last_format(self):
+        parser = DateTimeParser()
+
+        parser.parse("20160102T030405")
+        assert parser.last_format == Format.ISO8601.Basic.DATETIME
+        parser.parse("20160102T030406")
+        assert parser.last_format == Format.ISO8601.Basic.DATETIME
+        parser.parse("2016-01-02 03:04:05")
+        assert parser.last_format == Format.ISO.DATETIME
+
+    @pytest.mark.skipif("sys.version_info < (3, 2)")
+    def test_normal_mixed_format(self, monkeypatch):
+        import types
+
+        strptime_value_list = []
+
+        class StrptimeRecorder(datetime.datetime):
+
+            @classmethod
+            def strptime(cls, value, datetime_format):
+                strptime_value_list.append(value)
+                return datetime.datetime.strptime(value, datetime_format)
+
+        datetime_module = types.ModuleType("datetime")
+        datetime_module.__dict__.update(datetime.__dict__)
+        datetime_module.datetime = StrptimeRecorder
+        monkeypatch.setattr(thutils.gtime, "datetime", datetime_module)
+        parser = DateTimeParser([
+            Format.ISO.DATETIME_WITH_TZ, Format.ISO.DATETIME])
+
+        for value in [
+            "2016-01-02 03:04:05 +0900",
+            "2016-01-02 03:04:05",
+            "2016-01-02 03:04:05 +0900",
+        ]:
+            assert parser.parse(value).replace(
+                tzinfo=None) == datetime.datetime(2016, 1, 2, 3, 4, 5)
+        assert strptime_value_list == []
+
+        # non-padded variants are parsed by strptime
+        assert parser.parse("2016-1-2 3:4:5") == datetime.datetime(
+            2016, 1, 2, 3, 4, 5)
+        assert strptime_value_list == ["2016-1-2 3:4:5"]
+
+    @pytest.mark.skipif("sys.version_info < (3, 7)")
+    @pytest.mark.parametrize(["datetime_format", "value"], [
+        [Format.ISO.DATETIME, "2016-01-02 03:04:05"],
+        [Format.ISO.DATETIME, "2016-02-30 03:04:05"],
+        [Format.ISO.DATETIME, "2016-1-2 3:4:5"],
+        [Format.ISO.DATETIME, "2016-01-02 03:04:05\n"],
+        [Format.ISO8601.Basic.DATETIME, "20160102T030405"],
+        [Format.ISO8601.Extended.DATETIME, "2016-01-02T03:04:05+0900"],
+        [Format.ISO8601.Extended.DATETIME, "2016-01-02T03:04:05-2359"],
+        [Format.ISO8601.Extended.DATETIME, "2016-01-02T03:04:05+0099"],
+        [Format.ISO8601.Extended.DATETIME, "2016-01-02T03:04:05+0060"],
+        [Format.ISO8601.Extended.DATETIME, "2016-01-02T03:04:05+2400"],
+        [Format.ISO8601.Extended.DATETIME, "2016-01-02T03:04:05-2400"],
+        [Format.ISO8601.Extended.DATETIME, "2016-01-02T03:04:05+09:00"],
+        [Format.ISO.DATETIME_WITH_TZ, "2016-01-02 03:04:05 +0099"],
+        [Format.ISO.DATETIME_WITH_TZ, "2016-01-02 03:04:05 +2400"],
+    ])
+    def test_normal_same_as_strptime(self, datetime_format, value):
+        # the fast paths give the same results as strptime
+        try:
+            expected = datetime.datetime.strptime(value, datetime_format)
+        except ValueError:
+            expected = None
+
+        try:
+            dt = DateTimeParser([datetime_format]).parse(value)
+        except ValueError:
+            dt = None
+
+        assert dt == expected
+        if dt is not None:
+            assert dt.utcoffset() == expected.utcoffset()
+
+    @pytest.mark.parametrize(["format_list", "value", "expected"], [
+        [None, "2016-13-02 03:04:05", ValueError],
+        [None, "2016-01-02", ValueError],
+        [None, "2016-01-02 03:04:05\n", ValueError],
+        [None, "", ValueError],
+        [None, None, TypeError],
+        [[Format.ISO.DATETIME], "20160102T030405", ValueError],
+    ])
+    def test_exception(self, format_list, value, expected):
+        with pytest.raises(expected):
+            DateTimeParser(format_list).parse(value)
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [[], ValueError],
+    ])
+    def test_exception_init(self, value, expected):
+        with pytest.raises(expected):
+            DateTimeParser(value)
+
+
+class Test_to_epoch_array:
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [
+            ["1970-01-01 00:00:00", "2016-01-02 03:04:05"],
+            [0, 1451703845],
+        ],
+        [
+            ["2016-01-02 03:04:05 +0900", "2016-01-02 03:04:05 -0130"],
+            [1451703845 - 9 * 3600, 1451703845 + 90 * 60],
+        ],
+        [["2016-02-29 00:00:00"], [1456704000]],
+        [["1969-12-31 23:59:59"], [-1]],
+        [[], []],
+    ])
+    def test_normal(self, value, expected):
+        assert list(to_epoch_array(value)) == expected
+        assert list(to_epoch_array(tuple(value))) == expected
+        assert list(to_epoch_array(iter(value))) == expected
+        assert thutils.gtime._to_epoch_list(value) == expected
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [["2016-02-30 00:00:00"], ValueError],
+        [["2015-02-29 00:00:00"], ValueError],
+        [["2016-13-01 00:00:00"], ValueError],
+        [["2016-01-01 24:00:00"], ValueError],
+        [["2016-01-01T00:00:00"], ValueError],
+        [["2016-01-01 00:00:00 +09:0"], ValueError],
+        [["2016-01-01"], ValueError],
+        [["2016-01-01 00:00:00", "a"], ValueError],
+        [["2016-01-01 00:00:00\n"], ValueError],
+        [["2016-01-01 00:00:00 +0900\n"], ValueError],
+        [[b"2016-01-01 00:00:00"], TypeError],
+        [[1451606400], TypeError],
+        ["2016-01-02 03:04:05", TypeError],
+        [b"2016-01-02 03:04:05", TypeError],
+        [["2016-01-02 03:04:05", 1], TypeError],
+        [["2016-01-02 03:04:05", None], TypeError],
+        [[["2016-01-02 03:04:05"]], TypeError],
+        [[["2016-01-02 03:04:05"], "2016-01-02 03:04:05"], TypeError],
+    ])
+    def test_exception(self, value, expected):
+        with pytest.raises(expected):
+            to_epoch_array(value)
+
+        # both of the paths reject the same values
+        with pytest.raises(expected):
+            thutils.gtime._to_epoch_list(value)
+
+        numpy = pytest.importorskip("numpy")
+        with pytest.raises(expected):
+            thutils.gtime._to_epoch_ndarray(value, numpy)
+
+    def test_exception_ndarray(self):
+        numpy = pytest.importorskip("numpy")
+
+        with pytest.raises(TypeError):
+            to_epoch_array(numpy.array([["2016-01-02 03:04:05"]]))
+
+
+class Test_to_datetime64_array:
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [
+            ["2016-01-02 03:04:05", "2016-01-02 03:04:05 +0900"],
+            ["2016-01-02T03:04:05", "2016-01-01T18:04:05"],
+        ],
+    ])
+    def test_normal(self, value, expected):
+        numpy = pytest.importorskip("numpy")
+
+        assert numpy.array_equal(
+            to_datetime64_array(value),
+            numpy.array(expected, dtype="datetime64[s]"))
+
+
+class Test_TimeBucketAggregator:
+
+    def test_normal(self):
+        aggregator = TimeBucketAggregator("1m")
+        aggregator.add_all([
+            [datetime.datetime(2016, 1, 1, 0, 1, 30), 2],
+            [datetime.datetime(2016, 1, 1, 0, 0, 10), 1],
+            [datetime.datetime(2016, 1, 1, 0, 1, 0), 5],
+            [1451606499, -1],
+        ])
+
+        assert len(aggregator) == 2
+        assert list(aggregator.iter_bucket()) == [
+            (1451606400, 1, 1, 1, 1),
+            (1451606460, 3, 6, -1, 5),
+        ]
+
+    def test_normal_timezone(self):
+        aggregator = TimeBucketAggregator("1h")
+        aggregator.add(
+            DateTimeParser().parse("2016-01-01T09:30:00+0900"))
+
+        assert list(aggregator.iter_bucket()) == [
+            (1451606400, 1, 1, 1, 1),
+        ]
+
+    def test_normal_merge(self):
+        lhs = TimeBucketAggregator("1d")
+        lhs.add(0, 1)
+        lhs.add(86400, 10)
+        rhs = TimeBucketAggregator("1d")
+        rhs.add(100, -3)
+        rhs.add(86400 * 2, 4)
+
+        assert list(lhs.merge(rhs).iter_bucket()) == [
+            (0, 2, -2, -3, 1),
+            (86400, 1, 10, 10, 10),
+            (86400 * 2, 1, 4, 4, 4),
+        ]
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        ["0s", ValueError],
+        ["1x", ValueError],
+        [None, ValueError],
+    ])
+    def test_exception(self, value, expected):
+        with pytest.raises(expected):
+            TimeBucketAggregator(value)
+
+    def test_exception_merge(self):
+        with pytest.raises(ValueError):
+            TimeBucketAggregator("1m").merge(TimeBucketAggregator("1h"))
+
+
+class Test_split_time_range:
+
+    @pytest.mark.parametrize(
+        ["start", "end", "split_count", "unit", "overlap", "expected"], [
+            [
+                datetime.datetime(2016, 1, 1, 0, 0, 0),
+                datetime.datetime(2016, 1, 1, 3, 0, 0),
+                3, None, 0,
+                [
+                    ("2016-01-01 00:00:00", "2016-01-01 01:00:00"),
+                    ("2016-01-01 01:00:00", "2016-01-01 02:00:00"),
+                    ("2016-01-01 02:00:00", "2016-01-01 03:00:00"),
+                ],
+            ],
+            [
+                "2016-01-01 00:30:00", "2016-01-01 02:10:00",
+                None, "h", 0,
+                [
+                    ("2016-01-01 00:30:00", "2016-01-01 01:00:00"),
+                    ("2016-01-01 01:00:00", "2016-01-01 02:00:00"),
+                    ("2016-01-01 02:00:00", "2016-01-01 02:10:00"),
+                ],
+            ],
+            [
+                "2016-01-01 00:00:00", "2016-01-01 02:00:00",
+                None, "h", 60,
+                [
+                    ("2016-01-01 00:00:00", "2016-01-01 01:01:00"),
+                    ("2016-01-01 00:59:00", "2016-01-01 02:00:00"),
+                ],
+            ],
+            [
+                # 2016-01-06 is Wednesday
+                "2016-01-06 12:00:00", "2016-01-12 00:00:00",
+                None, "w", 0,
+                [
+                    ("2016-01-06 12:00:00", "2016-01-11 00:00:00"),
+                    ("2016-01-11 00:00:00", "2016-01-12 00:00:00"),
+                ],
+            ],
+        ])
+    def test_normal(self, start, end, split_count, unit, overlap, expected):
+        result = split_time_range(
+            start, end, split_count=split_count, unit=unit,
+            overlap_second=overlap)
+
+        assert [
+            (window_start.strftime(Format.ISO.DATETIME),
+             window_end.strftime(Format.ISO.DATETIME))
+            for window_start, window_end in result
+        ] == expected
+
+    def test_normal_short_range(self):
+        start = datetime.datetime(2016, 1, 1)
+        end = start + datetime.timedelta(microseconds=3)
+
+        assert split_time_range(start, end, split_count=10) == [(start, end)]
+
+    @pytest.mark.skipif("sys.version_info < (3, 2)")
+    def test_normal_timezone(self):
+        parser = DateTimeParser()
+        result = split_time_range(
+            parser.parse("2016-01-01T08:30:00+0900"),
+            parser.parse("2016-01-01T10:00:00+0900"), unit="d")
+
+        assert len(result) == 1
+
+    @pytest.mark.parametrize(
+        ["start", "end", "split_count", "unit", "overlap", "expected"], [
+            [
+                "2016-01-01 00:00:00", "2016-01-01 00:00:00",
+                1, None, 0, ValueError,
+            ],
+            [
+                "2016-01-01 00:00:00", "2016-01-01 01:00:00",
+                None, None, 0, ValueError,
+            ],
+            [
+                "2016-01-01 00:00:00", "2016-01-01 01:00:00",
+                1, "h", 0, ValueError,
+            ],
+            [
+                "2016-01-01 00:00:00", "2016-01-01 01:00:00",
+                0, None, 0, ValueError,
+            ],
+            [
+                "2016-01-01 00:00:00", "2016-01-01 01:00:00",
+                None, "x", 0, ValueError,
+            ],
+            [
+                "2016-01-01 00:00:00", "2016-01-01 01:00:00",
+                1, None, -1, ValueError,
+            ],
+            ["a", "2016-01-01 01:00:00", 1, None, 0, ValueError],
+        ])
+    def test_exception(self, start, end, split_count, unit, overlap, expected):
+        with pytest.raises(expected):
+            split_time_range(
+                start, end, split_count=split_count, unit=unit,
+                overlap_second=overlap)
+
+
+class Test_map_time_range:
+
+    @pytest.mark.parametrize(["workers", "use_process"], [
+        [None, False],
+        [4, False],
+        [4, True],
+    ])
+    def test_normal(self, workers, use_process):
+        import operator
+
+        time_range_list = split_time_range(
+            "2016-01-01 00:00:00", "2016-01-01 10:00:00", unit="h")
+
+        assert map_time_range(
+            operator.sub, time_range_list, workers, use_process) == [
+            -datetime.timedelta(hours=1)] * 10
+        assert map_time_range(
+            operator.sub, time_range_list, workers, use_process,
+            merge_func=operator.add) == -datetime.timedelta(hours=10)
+
+    def test_normal_empty(self):
+        assert map_time_range(lambda start, end: 1, []) == []
+
+
+class Test_DateTimeFormatter_format_datetime:
+
+    @pytest.mark.parametrize(
+        ["datetime_format", "subsecond_digit", "expected"], [
+        [Format.ISO.DATETIME, 0, "2016-01-02 03:04:05"],
+        [Format.ISO.DATETIME, 3, "2016-01-02 03:04:05.012"],
+        [Format.ISO.DATETIME, 6, "2016-01-02 03:04:05.012345"],
+        [Format.ISO8601.Basic.DATETIME, 3, "20160102T030405.012"],
+    ])
+    def test_normal(self, datetime_format, subsecond_digit, expected):
+        formatter = DateTimeFormatter(datetime_format, subsecond_digit)
+        dt = datetime.datetime(2016, 1, 2, 3, 4, 5, 12345)
+
+        assert formatter.format_datetime(dt) == expected
+        assert formatter.format_datetime(dt) == expected
+        assert formatter.format_datetime(
+            dt + datetime.timedelta(seconds=1)) == expected.replace(
+            "05", "06")
+
+    @pytest.mark.skipif("sys.version_info < (3, 2)")
+    @pytest.mark.parametrize(
+        ["datetime_format", "subsecond_digit", "expected"], [
+        [Format.ISO8601.Extended.DATETIME, 0, "2016-01-02T03:04:05+0900"],
+        [
+            Format.ISO8601.Extended.DATETIME, 3,
+            "2016-01-02T03:04:05.012+0900",
+        ],
+        [Format.ISO.DATETIME_WITH_TZ, 6, "2016-01-02 03:04:05.012345 +0900"],
+    ])
+    def test_normal_timezone(
+            self, datetime_format, subsecond_digit, expected):
+        formatter = DateTimeFormatter(datetime_format, subsecond_digit)
+        dt = DateTimeParser().parse("2016-01-02T03:04:05+0900").replace(
+            microsecond=12345)
+
+        assert formatter.format_datetime(dt) == expected
+        assert formatter.format_datetime(
+            dt.replace(tzinfo=None)) == expected.replace("+0900", "")
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [1, ValueError],
+        [None, ValueError],
+    ])
+    def test_exception(self, value, expected):
+        with pytest.raises(expected):
+            DateTimeFormatter(subsecond_digit=value)
+
+
+class Test_DateTimeFormatter_format_epoch:
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [0, "1970-01-01 00:00:00.000"],
+        [1451703845.5, "2016-01-02 03:04:05.500"],
+        [1451703845.999, "2016-01-02 03:04:05.999"],
+        [-0.5, "1969-12-31 23:59:59.500"],
+        [1700000000.123, "2023-11-14 22:13:20.123"],
+        [1451703845.001, "2016-01-02 03:04:05.001"],
+        [1451703845.9999999, "2016-01-02 03:04:06.000"],
+    ])
+    def test_normal(self, value, expected):
+        formatter = DateTimeFormatter(subsecond_digit=3)
+
+        assert formatter.format_epoch(value, utc=True) == expected
+        assert formatter.format_epoch(value, utc=True) == expected
+
+    @pytest.mark.parametrize(["value"], [
+        [1451703845.3],
+        [1700000000.123456],
+        [-1.000001],
+    ])
+    def test_normal_fromtimestamp(self, value):
+        formatter = DateTimeFormatter(subsecond_digit=6)
+        expected = (
+            datetime.datetime(1970, 1, 1) +
+            datetime.timedelta(seconds=value)).strftime(
+            "%Y-%m-%d %H:%M:%S.%f")
+
+        assert formatter.format_epoch(value, utc=True) == expected
+
+    def test_normal_localtime(self):
+        import time
+
+        formatter = DateTimeFormatter()
+        now = time.time()
+
+        assert formatter.format_epoch(now) == time.strftime(
+            Format.ISO.DATETIME, time.localtime(now))
@@ -6,6 +6,8 @@
 :required: py.test
 '''
 
+import codecs
+import json
 import re
 
 import pytest
@@ -13,7 +15,14 @@ import six
 from voluptuous import Schema, Required, Any, Range, Invalid, ALLOW_EXTRA
 
 import thutils
+import thutils.logscan
+from thutils.loader import JsonBackend
+from thutils.loader import JsonLinesLoader
+from thutils.loader import JsonLoadCache
 from thutils.loader import JsonLoader
+from thutils.loader import get_compression
+from thutils.loader import get_json_decoder
+from thutils.loader import resolve_json_backend
 
 
 TEMP_FILE_NAME = "tmp.json"
@@ -106,6 +115,74 @@ class Test_JsonLoader_load:
             JsonLoader.loads(value, schema)
 
 
+class Test_JsonLoader_load_sniff:
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [TEST_JSON.encode("utf-8"), EXPECTED],
+        [codecs.BOM_UTF8 + TEST_JSON.encode("utf-8"), EXPECTED],
+        [TEST_JSON.encode("utf-16"), EXPECTED],
+        [TEST_JSON.encode("utf-32"), EXPECTED],
+        [
+            six.u('[{"name": "\u3042"}]').encode("utf-8"),
+            [{"name": six.u("\u3042")}],
+        ],
+    ])
+    def test_normal(self, tmpdir, value, expected):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write_binary(value)
+
+        assert JsonLoader.load(
+            str(p), file_check_mode=JsonLoader.FileCheckMode.SNIFF
+        ) == expected
+
+    @pytest.mark.parametrize(["value", "mode", "expected"], [
+        [six.b(""), JsonLoader.FileCheckMode.SNIFF, ValueError],
+        [six.b("abc"), JsonLoader.FileCheckMode.SNIFF, ValueError],
+        [six.b("{\0}"), JsonLoader.FileCheckMode.SNIFF, ValueError],
+        [six.b("{"), JsonLoader.FileCheckMode.NONE, ValueError],
+        [six.b("{}"), "invalid", ValueError],
+    ])
+    def test_exception(self, tmpdir, value, mode, expected):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write_binary(value)
+
+        with pytest.raises(expected):
+            JsonLoader.load(str(p), file_check_mode=mode)
+
+    @pytest.mark.parametrize(["mode"], [
+        [JsonLoader.FileCheckMode.MAGIC],
+        [JsonLoader.FileCheckMode.SNIFF],
+        [JsonLoader.FileCheckMode.NONE],
+    ])
+    def test_exception_directory(self, tmpdir, mode):
+        with pytest.raises(ValueError, match="not a JSON file"):
+            JsonLoader.load(str(tmpdir), file_check_mode=mode)
+
+
+class Test_JsonLoader_load_validation:
+
+    def test_normal_lazy(self, tmpdir):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write('{"id": 1, "name": 2}')
+
+        result = JsonLoader.load(
+            str(p), ITEM_SCHEMA, file_check_mode=JsonLoader.FileCheckMode.NONE,
+            lazy_validation=True)
+        assert result["id"] == 1
+
+        with pytest.raises(Invalid):
+            result["name"]
+
+    def test_normal_workers(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(JsonLoader, "validation_workers", 2)
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(json.dumps([{"id": i} for i in range(3000)]))
+
+        assert len(JsonLoader.load(
+            str(p), Schema([ITEM_SCHEMA]),
+            file_check_mode=JsonLoader.FileCheckMode.NONE)) == 3000
+
+
 class Test_JsonLoader_loads:
 
     @pytest.mark.parametrize(["value", "schema", "expected"], [
@@ -130,3 +207,586 @@ class Test_JsonLoader_loads:
     def test_exception(self, value, schema, expected):
         with pytest.raises(expected):
             JsonLoader.loads(value, schema)
+
+
+
+class Test_JsonLoader_json_backend:
+
+    @pytest.fixture(params=[
+        JsonBackend.STDLIB,
+        JsonBackend.ORJSON,
+        JsonBackend.SIMDJSON,
+        JsonBackend.UJSON,
+    ])
+    def json_backend(self, request, monkeypatch):
+        pytest.importorskip(request.param)
+        monkeypatch.setattr(JsonLoader, "json_backend", request.param)
+
+        return request.param
+
+    def test_normal_loads(self, json_backend):
+        value = six.u('{"name": "\u3042"}')
+
+        assert JsonLoader.loads(value.encode("utf-8")) == json.loads(value)
+        assert JsonLoader.loads(bytearray(value.encode("utf-8"))) == (
+            json.loads(value))
+        assert JsonLoader.loads(
+            value, Schema({"name": six.text_type})) == json.loads(value)
+
+    def test_normal_load(self, tmpdir, json_backend):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write_binary(TEST_JSON.encode("utf-16"))
+
+        assert JsonLoader.load(
+            str(p), file_check_mode=JsonLoader.FileCheckMode.SNIFF
+        ) == EXPECTED
+
+    def test_normal_json_lines(self, tmpdir, json_backend):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write('{"id": 1}\n{"id": 2}\n')
+
+        assert JsonLinesLoader.load(str(p), ITEM_SCHEMA, workers=2) == [
+            {"id": 1}, {"id": 2}]
+
+    def test_exception_loads(self, json_backend):
+        with pytest.raises(ValueError):
+            JsonLoader.loads('{"a": 1,}')
+
+    def test_normal_resolve(self):
+        assert resolve_json_backend(JsonBackend.STDLIB) == JsonBackend.STDLIB
+        assert resolve_json_backend(
+            JsonBackend.AUTO) in JsonBackend.AUTO_ORDER
+        assert get_json_decoder(JsonBackend.AUTO) is get_json_decoder(
+            JsonBackend.AUTO)
+
+    def test_exception_resolve(self):
+        with pytest.raises(ValueError):
+            get_json_decoder("invalid")
+
+
+class Test_JsonLoader_load_many:
+
+    @pytest.mark.parametrize(["workers", "use_process"], [
+        [None, False],
+        [4, False],
+        [4, True],
+    ])
+    def test_normal(self, tmpdir, workers, use_process):
+        path_list = []
+        for i in range(5):
+            p = tmpdir.join("%d.json" % (i))
+            p.write('{"id": %d}' % (i))
+            path_list.append(str(p))
+
+        invalid_path = str(tmpdir.join("invalid.json"))
+        tmpdir.join("invalid.json").write('{"id": "a"}')
+        broken_path = str(tmpdir.join("broken.json"))
+        tmpdir.join("broken.json").write('{"id": ')
+        not_found_path = str(tmpdir.join("not_found.json"))
+
+        result_table, error_table = JsonLoader.load_many(
+            path_list + [invalid_path, broken_path, not_found_path],
+            ITEM_SCHEMA, workers, use_process,
+            file_check_mode=JsonLoader.FileCheckMode.NONE)
+
+        assert result_table == dict([
+            (path, {"id": i}) for i, path in enumerate(path_list)])
+        assert sorted(error_table) == sorted([
+            invalid_path, broken_path, not_found_path])
+        assert isinstance(error_table[invalid_path], Invalid)
+        assert isinstance(error_table[broken_path], ValueError)
+        assert isinstance(
+            error_table[not_found_path], thutils.gfile.FileNotFoundError)
+
+    def test_normal_empty(self):
+        assert JsonLoader.load_many([], workers=4) == ({}, {})
+
+
+class Test_JsonLoader_load_columns:
+
+    RECORD_LIST = [
+        {"id": 1, "name": "a", "value": 1, "flag": True, "tags": ["x"]},
+        {"id": 2, "name": "b", "value": 0.5, "flag": False, "tags": []},
+        {"id": 3, "name": "a", "value": 2, "flag": True},
+    ]
+
+    def test_normal(self, tmpdir):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(json.dumps(self.RECORD_LIST))
+
+        table = JsonLoader.load_columns(str(p))
+
+        assert len(table) == 3
+        assert table.column_name_list == [
+            "id", "name", "value", "flag", "tags"]
+        assert table.column_type_table == {
+            "id": int,
+            "name": six.text_type,
+            "value": float,
+            "flag": bool,
+            "tags": object,
+        }
+        assert list(table.get_column("id")) == [1, 2, 3]
+        assert table.get_column("id").typecode in ["q", "l"]
+        assert table.get_column("value").typecode == "d"
+        assert table.get_column("name")[0] is table.get_column("name")[2]
+
+        assert dict(table[1]) == dict(self.RECORD_LIST[1])
+        assert table[-1]["tags"] is None
+        assert table[0]["flag"] is True
+        assert [row["id"] for row in table] == [1, 2, 3]
+
+        with pytest.raises(IndexError):
+            table[3]
+        with pytest.raises(KeyError):
+            table[0]["not_exist"]
+
+    def test_normal_column_type_table(self, tmpdir):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(json.dumps({"data": self.RECORD_LIST}))
+
+        table = JsonLoader.load_columns(
+            str(p), {"id": int, "value": float, "tags": object},
+            item_path=["data"])
+
+        assert table.column_name_list == ["id", "value", "tags"]
+        assert list(table.get_column("value")) == [1.0, 0.5, 2.0]
+        assert table.get_column("tags") == [["x"], [], None]
+
+    def test_normal_numpy(self, tmpdir):
+        numpy = pytest.importorskip("numpy")
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(json.dumps(self.RECORD_LIST))
+
+        table = JsonLoader.load_columns(str(p))
+
+        assert table.to_numpy("id").tolist() == [1, 2, 3]
+        assert table.to_numpy("value").dtype == numpy.float64
+        assert table.to_numpy("flag").tolist() == [True, False, True]
+        assert table.to_numpy("tags").tolist() == [["x"], [], None]
+
+    @pytest.mark.parametrize(["value", "column_type_table", "expected"], [
+        [[{"id": "1"}], {"id": int}, ValueError],
+        [[{"name": "a"}], {"id": int}, ValueError],
+        [[{"id": 1}], {"id": list}, ValueError],
+        [[1, 2], None, ValueError],
+    ])
+    def test_exception(self, tmpdir, value, column_type_table, expected):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(json.dumps(value))
+
+        with pytest.raises(expected):
+            JsonLoader.load_columns(str(p), column_type_table)
+
+
+
+def write_compressed(path, data, compression):
+    if compression == "gzip":
+        import gzip
+
+        with gzip.GzipFile(path, "wb") as fp:
+            fp.write(data)
+    elif compression == "bzip2":
+        import bz2
+
+        with bz2.BZ2File(path, "wb") as fp:
+            fp.write(data)
+    elif compression == "xz":
+        lzma = pytest.importorskip("lzma")
+
+        with lzma.LZMAFile(path, "wb") as fp:
+            fp.write(data)
+
+
+class Test_JsonLoader_load_compressed:
+
+    @pytest.mark.parametrize(["file_name", "compression", "mode"], [
+        ["tmp.json.gz", "gzip", JsonLoader.FileCheckMode.MAGIC],
+        ["tmp.json.bz2", "bzip2", JsonLoader.FileCheckMode.SNIFF],
+        ["tmp.json.xz", "xz", JsonLoader.FileCheckMode.NONE],
+        ["tmp.json", "gzip", JsonLoader.FileCheckMode.SNIFF],
+    ])
+    def test_normal(self, tmpdir, file_name, compression, mode):
+        p = str(tmpdir.join(file_name))
+        write_compressed(p, TEST_JSON.encode("utf-8"), compression)
+
+        assert get_compression(p) == compression
+        assert JsonLoader.load(p, SCHEMA, file_check_mode=mode) == EXPECTED
+        assert JsonLoader.load_paths(p, ["/thread"]) == {"/thread": 8}
+
+    def test_normal_iter_items(self, tmpdir):
+        expected = [{"id": i} for i in range(1000)]
+        p = str(tmpdir.join("tmp.json.gz"))
+        write_compressed(p, json.dumps(expected).encode("utf-8"), "gzip")
+
+        assert list(JsonLoader.iter_items(p, ITEM_SCHEMA)) == expected
+
+    @pytest.mark.parametrize(["workers"], [
+        [None],
+        [2],
+    ])
+    def test_normal_json_lines(self, tmpdir, workers):
+        p = str(tmpdir.join("tmp.jsonl.bz2"))
+        write_compressed(p, six.b('{"id": 1}\n{"id": 2}\n'), "bzip2")
+
+        assert JsonLinesLoader.load(p, ITEM_SCHEMA, workers) == [
+            {"id": 1}, {"id": 2}]
+
+    def test_exception(self, tmpdir):
+        p = str(tmpdir.join("tmp.json.gz"))
+        write_compressed(p, six.b("abc"), "gzip")
+
+        with pytest.raises(ValueError):
+            JsonLoader.load(p)
+
+ITEM_SCHEMA = Schema({
+    Required("id"): int,
+    "name": six.text_type,
+})
+
+
+class Test_JsonLoader_iter_items:
+
+    @pytest.mark.parametrize(["value", "item_path", "expected"], [
+        [
+            '[{"id": 1, "name": "a"}, {"id": 2, "name": "b\\"]}"}]',
+            None,
+            [{"id": 1, "name": "a"}, {"id": 2, "name": 'b"]}'}],
+        ],
+        [
+            """
+            {
+                "meta": {"records": [{"id": 0}], "note": "[{\\"id\\": 0}]"},
+                "data": {"records": [{"id": 1}, {"id": 2}]}
+            }
+            """,
+            ["data", "records"],
+            [{"id": 1}, {"id": 2}],
+        ],
+        [
+            '[[{"id": 0}], [{"id": 1}]]',
+            [1],
+            [{"id": 1}],
+        ],
+        ["[]", None, []],
+        [" [ ] ", None, []],
+    ])
+    def test_normal(self, tmpdir, value, item_path, expected):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(value)
+
+        assert list(JsonLoader.iter_items(
+            str(p), ITEM_SCHEMA, item_path)) == expected
+
+    def test_normal_large(self, tmpdir):
+        expected = [
+            {"id": i, "name": six.u("あ") * (i % 100)}
+            for i in range(10000)
+        ]
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write_binary(json.dumps(expected).encode("utf-8"))
+
+        assert list(JsonLoader.iter_items(str(p), ITEM_SCHEMA)) == expected
+
+    def test_normal_skip_large_sibling(self, monkeypatch, tmpdir):
+        from thutils.loader import _JsonStreamReader
+
+        chunk_size = _JsonStreamReader._JsonStreamReader__CHUNK_SIZE
+        meta = {"records": [{"id": i, "note": '"]}' * 10} for i in range(
+            chunk_size // 10)]}
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(json.dumps(
+            {"meta": meta, "data": {"records": [{"id": 1}, {"id": 2}]}}))
+
+        # record the buffer sizes while skipping the "meta" value
+        max_size_list = [0]
+        fill = _JsonStreamReader._JsonStreamReader__fill
+
+        def record_fill(reader):
+            max_size_list[0] = max(
+                max_size_list[0], len(reader._JsonStreamReader__buf))
+            return fill(reader)
+
+        monkeypatch.setattr(
+            _JsonStreamReader, "_JsonStreamReader__fill", record_fill)
+
+        assert list(JsonLoader.iter_items(
+            str(p), ITEM_SCHEMA, ["data", "records"])) == [
+                {"id": 1}, {"id": 2}]
+        assert p.size() > chunk_size * 4
+        assert max_size_list[0] <= chunk_size * 2
+
+    @pytest.mark.parametrize(["value", "schema", "item_path", "expected"], [
+        ['{"id": 1}', None, None, ValueError],
+        ['[{"id": 1}', None, None, ValueError],
+        ['[{"id": 1} {"id": 2}]', None, None, ValueError],
+        ['[{"id": 1}, ]', None, None, ValueError],
+        ['[{"id": "1"}]', ITEM_SCHEMA, None, Invalid],
+        ['{"data": []}', None, ["records"], KeyError],
+        ['[[]]', None, [1], KeyError],
+    ])
+    def test_exception(self, tmpdir, value, schema, item_path, expected):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(value)
+
+        with pytest.raises(expected):
+            list(JsonLoader.iter_items(str(p), schema, item_path))
+
+    def test_exception_not_found(self, tmpdir):
+        with pytest.raises(thutils.gfile.FileNotFoundError):
+            list(JsonLoader.iter_items(str(tmpdir.join("not_exist.json"))))
+
+    def test_exception_directory(self, tmpdir):
+        with pytest.raises(ValueError, match="not a JSON file"):
+            list(JsonLoader.iter_items(str(tmpdir)))
+
+
+class Test_JsonLoader_load_paths:
+
+    JSON_TEXT = """
+    {
+        "config": {"section": {"a": 1, "b/c": [1, 2]}, "other": "x"},
+        "summary": {"count": 2},
+        "records": [{"id": 1}, {"id": 2, "name": "~"}]
+    }
+    """
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [
+            ["/config/section", "/summary/count"],
+            {
+                "/config/section": {"a": 1, "b/c": [1, 2]},
+                "/summary/count": 2,
+            },
+        ],
+        [
+            ["/config/section/b~1c/1", "/records/1/name"],
+            {"/config/section/b~1c/1": 2, "/records/1/name": "~"},
+        ],
+        [
+            [("records", 0), ("config", "section", "a")],
+            {("records", 0): {"id": 1}, ("config", "section", "a"): 1},
+        ],
+        [
+            ["/summary", "/summary/count", "/summary"],
+            {"/summary": {"count": 2}, "/summary/count": 2},
+        ],
+        [
+            ["/not_exist", "/records/2", "/config/other/x", "/summary"],
+            {"/summary": {"count": 2}},
+        ],
+        [[], {}],
+    ])
+    def test_normal(self, tmpdir, value, expected):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(self.JSON_TEXT)
+
+        assert JsonLoader.load_paths(str(p), value) == expected
+
+    def test_normal_root(self, tmpdir):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(TEST_JSON)
+
+        assert JsonLoader.load_paths(str(p), [""]) == {"": EXPECTED}
+
+    def test_normal_stop_reading(self, tmpdir):
+        # the malformed tail is not read after all of the paths found
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write('{"summary": {"count": 2}, "records": [')
+
+        assert JsonLoader.load_paths(str(p), ["/summary/count"]) == {
+            "/summary/count": 2}
+
+    def test_normal_skip_large_value(self, tmpdir):
+        import io
+
+        from thutils.loader import _JsonStreamReader
+
+        # larger than the chunk size, with escapes on chunk boundaries
+        big_value = [
+            {"text": 'a\\"[{' * (i % 50), "values": list(range(i % 10))}
+            for i in range(20000)
+        ]
+        json_text = json.dumps({"big": big_value, "summary": {"count": 2}})
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(json_text)
+
+        assert JsonLoader.load_paths(str(p), ["/summary"]) == {
+            "/summary": {"count": 2}}
+
+        chunk_size = _JsonStreamReader._JsonStreamReader__CHUNK_SIZE
+        assert len(json_text) > chunk_size * 4
+
+        # the skipped value is not held in the buffer
+        reader = _JsonStreamReader(io.StringIO(six.text_type(json_text)))
+        reader.find_path(["big"])
+        reader.skip_value()
+        assert len(reader._JsonStreamReader__buf) <= chunk_size * 2
+        assert reader.peek() == ","
+
+        reader = _JsonStreamReader(io.StringIO(six.text_type(json_text)))
+        reader.find_path(["big"])
+        assert reader.decode_value() == big_value
+
+    @pytest.mark.parametrize(["value", "path_list", "expected"], [
+        ['{"a": 1', ["/b"], ValueError],
+        ['{"a": 1}', ["a"], ValueError],
+    ])
+    def test_exception(self, tmpdir, value, path_list, expected):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(value)
+
+        with pytest.raises(expected):
+            JsonLoader.load_paths(str(p), path_list)
+
+    def test_exception_directory(self, tmpdir):
+        with pytest.raises(ValueError, match="not a JSON file"):
+            JsonLoader.load_paths(str(tmpdir), ["a"])
+
+
+class Test_JsonLinesLoader_load:
+
+    @pytest.mark.parametrize(["workers"], [
+        [None],
+        [1],
+        [3],
+    ])
+    def test_normal(self, tmpdir, workers):
+        expected = [
+            {"id": i, "name": six.u("あ") * (i % 5)} for i in range(100)]
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write_binary(("\n".join(
+            [json.dumps(record) for record in expected] + ["", " "])
+        ).encode("utf-8"))
+
+        assert JsonLinesLoader.load(str(p), ITEM_SCHEMA, workers) == expected
+        assert list(JsonLinesLoader.iter_items(
+            str(p), None, workers)) == expected
+
+    @pytest.mark.parametrize(["workers"], [
+        [None],
+        [2],
+    ])
+    def test_normal_empty(self, tmpdir, workers):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write("")
+
+        assert JsonLinesLoader.load(str(p), ITEM_SCHEMA, workers) == []
+
+    def test_normal_small_chunk(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(thutils.logscan, "_CHUNK_SIZE_LIMIT", 64)
+        expected = [{"id": i, "name": "a" * (i % 7)} for i in range(200)]
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write("\n".join([json.dumps(record) for record in expected]))
+
+        assert JsonLinesLoader.load(str(p), ITEM_SCHEMA, 2) == expected
+
+    @pytest.mark.parametrize(["value", "schema", "workers", "expected"], [
+        ['{"id": 1}\n{"id": 2\n', None, None, ValueError],
+        ['{"id": 1}\n{"id": 2\n', None, 2, ValueError],
+        ['{"id": 1}\n{"id": "2"}\n', ITEM_SCHEMA, None, Invalid],
+        ['{"id": 1}\n{"id": "2"}\n', ITEM_SCHEMA, 2, Invalid],
+    ])
+    def test_exception(self, tmpdir, value, schema, workers, expected):
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(value)
+
+        with pytest.raises(expected):
+            JsonLinesLoader.load(str(p), schema, workers)
+
+    def test_exception_not_found(self, tmpdir):
+        with pytest.raises(thutils.gfile.FileNotFoundError):
+            JsonLinesLoader.load(str(tmpdir.join("not_exist.json")))
+
+    @pytest.mark.parametrize(["workers"], [
+        [None],
+        [2],
+    ])
+    def test_exception_directory(self, tmpdir, workers):
+        with pytest.raises(ValueError, match="not a JSON file"):
+            JsonLinesLoader.load(str(tmpdir), None, workers)
+
+
+class Test_JsonLoadCache_load:
+
+    @pytest.fixture
+    def cache(self, monkeypatch):
+        JsonLoadCache.clear()
+        monkeypatch.setattr(JsonLoadCache, "cache_dir_path", None)
+
+        yield JsonLoadCache
+
+        JsonLoadCache.clear()
+
+    @staticmethod
+    def make_load_func(call_list):
+        def load_func(json_file_path):
+            call_list.append(json_file_path)
+            with open(json_file_path) as fp:
+                return json.load(fp)
+
+        return load_func
+
+    def test_normal(self, tmpdir, cache):
+        call_list = []
+        load_func = self.make_load_func(call_list)
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(TEST_JSON)
+
+        result = cache.load(str(p), load_func=load_func)
+        assert result == json.loads(TEST_JSON)
+
+        # modification of the result does not affect the cache
+        result["thread"] = 1
+        assert cache.load(str(p), load_func=load_func)["thread"] == 8
+        assert len(call_list) == 1
+
+        p.write('{"thread": 16}')
+        assert cache.load(str(p), load_func=load_func) == {"thread": 16}
+        assert len(call_list) == 2
+
+    def test_normal_schema(self, tmpdir, cache):
+        call_list = []
+        load_func = self.make_load_func(call_list)
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(TEST_JSON)
+
+        validate_list = []
+
+        def schema(value):
+            validate_list.append(value)
+            return SCHEMA(value)
+
+        cache.load(str(p), schema, load_func)
+        assert cache.load(str(p), schema, load_func) == EXPECTED
+        assert len(validate_list) == 1
+
+        with pytest.raises(Invalid):
+            cache.load(str(p), Schema({"thread": str}), load_func)
+
+        assert len(call_list) == 1
+
+    def test_normal_disk(self, tmpdir, cache):
+        call_list = []
+        load_func = self.make_load_func(call_list)
+        p = tmpdir.join(TEMP_FILE_NAME)
+        p.write(TEST_JSON)
+        cache.cache_dir_path = str(tmpdir.join("cache"))
+
+        cache.load(str(p), load_func=load_func)
+        assert len(tmpdir.join("cache").listdir()) == 1
+
+        # discard the in-process tier only
+        cache.cache_dir_path = None
+        cache.clear()
+        cache.cache_dir_path = str(tmpdir.join("cache"))
+
+        assert cache.load(str(p), load_func=load_func) == json.loads(TEST_JSON)
+        assert len(call_list) == 1
+
+        cache.clear()
+        assert tmpdir.join("cache").listdir() == []
+
+    def test_exception(self, tmpdir, cache):
+        with pytest.raises(thutils.gfile.FileNotFoundError):
+            cache.load(str(tmpdir.join("not_exist.json")))
@@ -11,6 +11,7 @@ import sys
 
 import pytest
 
+from thutils.logger import CachedTimeFormatter
 from thutils.logger import logger
 
 
@@ -157,3 +158,38 @@ class Test_logger_fatal:
             # AttributeError: 'NoneType' object has no attribute '__context__'
             # が発生する
             logger.fatal(message, caller)
+
+
+class Test_CachedTimeFormatter:
+
+    @pytest.mark.parametrize(["fmt", "datefmt"], [
+        ["%(asctime)s %(message)s", None],
+        ["%(asctime)s %(message)s", "%Y-%m-%d %H:%M:%S"],
+        ["%(asctime)s %(message)s", "%H:%M:%S"],
+    ])
+    def test_normal(self, fmt, datefmt):
+        record = logging.LogRecord(
+            "test", logging.INFO, __file__, 1, "aaa", None, None)
+
+        for _i in range(2):
+            assert CachedTimeFormatter(fmt, datefmt).format(
+                record) == logging.Formatter(fmt, datefmt).format(record)
+
+    @pytest.mark.parametrize(["datefmt"], [
+        [None],
+        ["%Y-%m-%d %H:%M:%S"],
+    ])
+    @pytest.mark.parametrize(["created"], [
+        [1700000000.9999997],
+        [1700000000.9995],
+        [1700000001.0],
+    ])
+    def test_normal_second_boundary(self, datefmt, created):
+        fmt = "%(asctime)s %(message)s"
+        record = logging.LogRecord(
+            "test", logging.INFO, __file__, 1, "aaa", None, None)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+
+        assert CachedTimeFormatter(fmt, datefmt).format(
+            record) == logging.Formatter(fmt, datefmt).format(record)
@@ -0,0 +1,289 @@
+# encoding: utf-8
+
+'''
+@author: Tsuyoshi Hombashi
+'''
+
+import datetime
+
+import pytest
+import six
+
+import thutils.logscan
+from thutils.gfile import FileNotFoundError
+from thutils.logscan import *
+
+
+LOG_TEXT = "\n".join([
+    "2016-01-02 03:04:05 [INFO] start",
+    "continued line without timestamp",
+    "2016-01-02 03:04:06 +0900 [INFO] with timezone",
+    "2016-19-39 03:04:07 [INFO] invalid datetime",
+    "[INFO] 2016-01-02 03:04:08 in the middle",
+    "",
+])
+
+
+def make_log(tmpdir, text):
+    p = tmpdir.join("test.log")
+    p.write_binary(text.encode("ascii"))
+
+    return str(p)
+
+
+class Test_TimestampScanner_iter_timestamp:
+
+    @pytest.mark.parametrize(["workers"], [
+        [None],
+        [1],
+        [3],
+    ])
+    def test_normal(self, tmpdir, workers):
+        log_path = make_log(tmpdir, LOG_TEXT)
+        result = list(TimestampScanner().iter_timestamp(log_path, workers))
+
+        assert [offset for offset, _dt in result] == [
+            0,
+            LOG_TEXT.index("2016-01-02 03:04:06"),
+            LOG_TEXT.index("2016-01-02 03:04:08"),
+        ]
+        assert result[0][1] == datetime.datetime(2016, 1, 2, 3, 4, 5)
+        assert result[1][1].utcoffset() == datetime.timedelta(hours=9)
+        assert result[2][1] == datetime.datetime(2016, 1, 2, 3, 4, 8)
+
+        for offset, _dt in result:
+            assert LOG_TEXT[offset:offset + 4] == "2016"
+
+    @pytest.mark.parametrize(["workers"], [
+        [None],
+        [2],
+    ])
+    def test_normal_empty(self, tmpdir, workers):
+        log_path = make_log(tmpdir, "")
+
+        assert list(TimestampScanner().iter_timestamp(log_path, workers)) == []
+
+    def test_normal_small_chunk(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(thutils.logscan, "_CHUNK_SIZE_LIMIT", 64)
+        log_path = make_log(tmpdir, LOG_TEXT * 20)
+        scanner = TimestampScanner()
+
+        assert list(scanner.iter_timestamp(log_path, 2)) == list(
+            scanner.iter_timestamp(log_path))
+
+    def test_exception(self, tmpdir):
+        with pytest.raises(FileNotFoundError):
+            list(TimestampScanner().iter_timestamp(
+                str(tmpdir.join("not_exist.log"))))
+
+
+class Test_split_line_aligned_range:
+
+    @pytest.mark.parametrize(["value", "split_count", "expected"], [
+        ["aaa\nbbb\nccc\n", 1, [(0, 12)]],
+        ["aaa\nbbb\nccc\n", 3, [(0, 8), (8, 12)]],
+        ["aaa\nbbb\nccc\n", 100, [(0, 4), (4, 8), (8, 12)]],
+        ["aaaaaaaa", 4, [(0, 8)]],
+        ["", 4, []],
+    ])
+    def test_normal(self, tmpdir, value, split_count, expected):
+        assert split_line_aligned_range(
+            make_log(tmpdir, value), split_count) == expected
+
+    def test_exception(self, tmpdir):
+        with pytest.raises(ValueError):
+            split_line_aligned_range(make_log(tmpdir, "a"), 0)
+
+
+class Test_split_worker_range:
+
+    @pytest.mark.parametrize(["workers", "size_limit", "expected"], [
+        [1, 1024, [(0, 8), (8, 12)]],
+        [2, 1024, [(0, 4), (4, 8), (8, 12)]],
+        [1, 3, [(0, 4), (4, 8), (8, 12)]],
+        [1, 1, [(0, 4), (4, 8), (8, 12)]],
+    ])
+    def test_normal(self, monkeypatch, tmpdir, workers, size_limit, expected):
+        monkeypatch.setattr(thutils.logscan, "_CHUNK_PER_WORKER", 2)
+        monkeypatch.setattr(thutils.logscan, "_CHUNK_SIZE_LIMIT", size_limit)
+
+        assert thutils.logscan._split_worker_range(
+            make_log(tmpdir, "aaa\nbbb\nccc\n"), workers) == expected
+
+    def test_normal_size_limit(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(thutils.logscan, "_CHUNK_SIZE_LIMIT", 64)
+        log_path = make_log(tmpdir, LOG_TEXT * 100)
+
+        range_list = thutils.logscan._split_worker_range(log_path, 1)
+
+        assert range_list[0][0] == 0
+        assert range_list[-1][1] == len(LOG_TEXT) * 100
+        for start_offset, end_offset in range_list:
+            # chunks are extended to the end of the line
+            assert end_offset - start_offset < 64 + len(LOG_TEXT)
+
+
+class FakeAsyncResult(object):
+
+    def __init__(self, value):
+        self.__value = value
+
+    def get(self):
+        return self.__value
+
+
+class FakePool(object):
+
+    def __init__(self):
+        self.submit_count = 0
+
+    def apply_async(self, func, args):
+        self.submit_count += 1
+
+        return FakeAsyncResult(func(*args))
+
+
+class Test_imap_bounded:
+
+    def test_normal(self):
+        pool = FakePool()
+        result_iter = thutils.logscan._imap_bounded(
+            pool, lambda x: x * 2, range(100), 3)
+
+        for i, result in enumerate(result_iter):
+            assert result == i * 2
+            assert pool.submit_count <= i + 3 * 2
+
+        assert pool.submit_count == 100
+
+    def test_normal_empty(self):
+        assert list(thutils.logscan._imap_bounded(
+            FakePool(), abs, [], 2)) == []
+
+
+def make_ordered_log(tmpdir):
+    base_datetime = datetime.datetime(2016, 1, 1)
+    line_list = []
+
+    for i in range(1000):
+        dt = base_datetime + datetime.timedelta(minutes=i)
+        line_list.append("%s [INFO] message %d" % (
+            dt.strftime("%Y-%m-%d %H:%M:%S"), i))
+        if i % 10 == 0:
+            line_list.append("    continued line %d" % (i))
+
+    return make_log(tmpdir, "\n".join(line_list) + "\n")
+
+
+class Test_TimeRangeReader_search_offset:
+
+    @pytest.mark.parametrize(["value", "expected_line"], [
+        [datetime.datetime(2015, 1, 1), "2016-01-01 00:00:00"],
+        [datetime.datetime(2016, 1, 1, 1, 0, 0), "2016-01-01 01:00:00"],
+        [datetime.datetime(2016, 1, 1, 1, 0, 30), "2016-01-01 01:01:00"],
+        ["2016-01-01 10:00:00", "2016-01-01 10:00:00"],
+        [datetime.datetime(2017, 1, 1), ""],
+    ])
+    def test_normal(self, tmpdir, value, expected_line):
+        log_path = make_ordered_log(tmpdir)
+        offset = TimeRangeReader().search_offset(log_path, value)
+
+        with open(log_path, "rb") as fp:
+            fp.seek(offset)
+            line = fp.readline().decode("ascii")
+
+        assert line.startswith(expected_line)
+
+    def test_normal_empty(self, tmpdir):
+        assert TimeRangeReader().search_offset(
+            make_log(tmpdir, ""), datetime.datetime(2016, 1, 1)) == 0
+
+
+class Test_TimeRangeReader_iter_line:
+
+    @pytest.mark.parametrize(["start", "end", "expected_count"], [
+        [
+            datetime.datetime(2016, 1, 1, 1, 0, 0),
+            datetime.datetime(2016, 1, 1, 1, 59, 59),
+            60 + 6,
+        ],
+        [
+            "2016-01-01 01:00:00",
+            "2016-01-01 01:00:00",
+            1 + 1,
+        ],
+        [None, datetime.datetime(2016, 1, 1, 0, 9, 0), 10 + 1],
+        [datetime.datetime(2016, 1, 1, 16, 30), None, 10 + 1],
+        [None, None, 1000 + 100],
+        [datetime.datetime(2017, 1, 1), None, 0],
+    ])
+    def test_normal(self, tmpdir, start, end, expected_count):
+        log_path = make_ordered_log(tmpdir)
+        line_list = list(TimeRangeReader().iter_line(
+            log_path, start, end, encoding="ascii"))
+
+        assert len(line_list) == expected_count
+        if start is not None and expected_count > 0:
+            assert line_list[0].startswith(str(start))
+
+    def test_normal_tolerance(self, tmpdir):
+        log_path = make_log(tmpdir, "\n".join([
+            "2016-01-01 00:00:00 a",
+            "2016-01-01 00:00:03 b",
+            "2016-01-01 00:00:01 c",
+            "2016-01-01 00:00:05 d",
+            "",
+        ]))
+        start = datetime.datetime(2016, 1, 1, 0, 0, 1)
+        end = datetime.datetime(2016, 1, 1, 0, 0, 2)
+
+        assert list(TimeRangeReader().iter_line(log_path, start, end)) == []
+        assert list(TimeRangeReader(tolerance_second=2).iter_line(
+            log_path, start, end)) == [six.b("2016-01-01 00:00:01 c\n")]
+
+    @pytest.mark.parametrize(["start", "end", "expected"], [
+        ["2016-01-01 00:01:00", None, ["b", "c"]],
+        [None, "2016-01-01 00:01:00", ["a", "b"]],
+        [
+            datetime.datetime(2016, 1, 1, 0, 1, 0),
+            datetime.datetime(2016, 1, 1, 0, 1, 0),
+            ["b"],
+        ],
+        [
+            # 2015-12-31 15:01:00 UTC == 2016-01-01 00:01:00 +0900
+            datetime.datetime(
+                2015, 12, 31, 15, 1, 0, tzinfo=datetime.timezone.utc),
+            None,
+            ["b", "c"],
+        ],
+    ])
+    def test_normal_timezone(self, tmpdir, start, end, expected):
+        log_path = make_log(tmpdir, "\n".join([
+            "2016-01-01 00:00:00 +0900 a",
+            "2016-01-01 00:01:00 +0900 b",
+            "2016-01-01 00:02:00 +0900 c",
+            "",
+        ]))
+
+        assert [
+            line.rstrip()[-1]
+            for line in TimeRangeReader().iter_line(
+                log_path, start, end, encoding="ascii")
+        ] == expected
+        if start is not None:
+            assert TimeRangeReader().search_offset(log_path, start) == len(
+                "2016-01-01 00:00:00 +0900 a\n")
+
+    @pytest.mark.parametrize(["start", "end", "expected"], [
+        ["invalid", None, ValueError],
+        [None, "invalid", ValueError],
+    ])
+    def test_exception(self, tmpdir, start, end, expected):
+        with pytest.raises(expected):
+            list(TimeRangeReader().iter_line(
+                make_ordered_log(tmpdir), start, end))
+
+    def test_exception_not_found(self, tmpdir):
+        with pytest.raises(FileNotFoundError):
+            list(TimeRangeReader().iter_line(
+                str(tmpdir.join("not_exist.log"))))
@@ -0,0 +1,176 @@
+# encoding: utf-8
+
+'''
+@author: Tsuyoshi Hombashi
+'''
+
+import pytest
+
+from thutils.scheduler import *
+
+
+nan = float("nan")
+inf = float("inf")
+
+
+class FakeClock:
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Test_Deadline:
+
+    def test_normal(self):
+        clock = FakeClock()
+        deadline = Deadline(10, dry_run=True, clock=clock)
+        assert deadline.remaining_second == 10
+        assert not deadline.is_expired()
+
+        clock.now = 4
+        assert deadline.remaining_second == 6
+        assert deadline.sleep(100) == 0
+
+        clock.now = 11
+        assert deadline.remaining_second == 0
+        assert deadline.is_expired()
+
+    def test_sleep(self):
+        deadline = Deadline(0.1)
+        assert deadline.sleep(10) <= 0.1
+        assert deadline.is_expired()
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [None, TypeError],
+        ["a", ValueError],
+        [inf, OverflowError],
+        [nan, IOError],
+    ])
+    def test_exception(self, value, expected):
+        with pytest.raises(expected):
+            Deadline(value)
+
+
+class Test_TokenBucket:
+
+    def test_normal(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=2, dry_run=True, clock=clock)
+
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.1)
+        assert bucket.reserve() == pytest.approx(0.2)
+        assert bucket.get_token() == pytest.approx(-2)
+
+        clock.now = 0.5
+        assert bucket.get_token() == pytest.approx(2)
+        assert bucket.acquire(2) == 0
+
+    def test_try_acquire(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+
+        clock.now = 1
+        assert bucket.try_acquire()
+
+    def test_acquire(self, monkeypatch):
+        def sleep(second):
+            slept_list.append(second)
+            clock.now += second
+
+        slept_list = []
+        clock = FakeClock()
+        monkeypatch.setattr("time.sleep", sleep)
+        bucket = TokenBucket(rate=20, capacity=1, clock=clock)
+
+        assert bucket.acquire() == 0
+        assert bucket.acquire() == pytest.approx(0.05)
+        assert bucket.acquire() == pytest.approx(0.05)
+        assert slept_list == [pytest.approx(0.05)] * 2
+
+    @pytest.mark.parametrize(["rate", "expected"], [
+        [0.5, 1],
+        [1, 1],
+        [20, 20],
+    ])
+    def test_normal_default_capacity(self, rate, expected):
+        assert TokenBucket(rate, clock=FakeClock()).capacity == expected
+
+    @pytest.mark.parametrize(["rate", "capacity", "expected"], [
+        [0, None, ValueError],
+        [-1, None, ValueError],
+        [1, 0, ValueError],
+        [None, None, TypeError],
+        [inf, None, OverflowError],
+        [nan, None, IOError],
+        [1, nan, IOError],
+    ])
+    def test_exception_init(self, rate, capacity, expected):
+        with pytest.raises(expected):
+            TokenBucket(rate, capacity)
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [-1, ValueError],
+        [2, ValueError],
+        [inf, OverflowError],
+        [nan, IOError],
+    ])
+    def test_exception_reserve(self, value, expected):
+        bucket = TokenBucket(rate=1, capacity=1)
+
+        with pytest.raises(expected):
+            bucket.reserve(value)
+
+
+class Test_IntervalTicker:
+
+    def test_normal(self):
+        clock = FakeClock()
+        ticker = IntervalTicker(1, dry_run=True, clock=clock)
+
+        assert ticker.reserve() == 0
+
+        clock.now = 0.3
+        assert ticker.reserve() == pytest.approx(0.7)
+
+        # ticks are not drifted by oversleep
+        clock.now = 2.1
+        assert ticker.reserve() == pytest.approx(0.9)
+        assert ticker.tick_count == 3
+
+    def test_skip_missed_tick(self):
+        clock = FakeClock()
+        ticker = IntervalTicker(1, dry_run=True, clock=clock)
+        ticker.reserve()
+
+        clock.now = 5.5
+        assert ticker.reserve() == pytest.approx(0.5)
+
+    def test_iter_tick(self):
+        clock = FakeClock()
+        ticker = IntervalTicker(1, dry_run=True, clock=clock)
+        deadline = Deadline(2.5, clock=clock)
+        tick_list = []
+
+        for tick in ticker.iter_tick(deadline):
+            tick_list.append(tick)
+            clock.now += 1
+
+        assert tick_list == [1, 2, 3]
+
+    @pytest.mark.parametrize(["value", "expected"], [
+        [0, ValueError],
+        [None, TypeError],
+        [inf, OverflowError],
+        [nan, IOError],
+    ])
+    def test_exception(self, value, expected):
+        with pytest.raises(expected):
+            IntervalTicker(value)
@@ -0,0 +1,125 @@
+# encoding: utf-8
+
+'''
+@author: Tsuyoshi Hombashi
+'''
+
+import pytest
+import six
+from voluptuous import (
+    Schema, Required, Optional, Exclusive, Invalid, MultipleInvalid,
+    ALLOW_EXTRA)
+
+from thutils.validator import *
+
+
+ITEM_SCHEMA = Schema({
+    Required("id"): int,
+    "name": six.text_type,
+})
+
+
+class Test_get_validator:
+
+    def test_normal(self):
+        schema = Schema({"id": int})
+
+        validator = get_validator(schema)
+        assert validator.schema is schema
+        assert get_validator(schema) is validator
+
+    def test_normal_definition(self):
+        definition = {Required("id"): int}
+
+        validator = get_validator(definition)
+        assert isinstance(validator.schema, Schema)
+        assert get_validator(definition) is validator
+
+        validator.validate({"id": 1})
+        with pytest.raises(Invalid):
+            validator.validate({"id": "1"})
+
+
+class Test_SchemaValidator_validate:
+
+    @pytest.mark.parametrize(["workers"], [
+        [None],
+        [2],
+    ])
+    def test_normal(self, workers):
+        document = [{"id": i} for i in range(3000)]
+
+        SchemaValidator(Schema([ITEM_SCHEMA])).validate(document, workers)
+
+    @pytest.mark.parametrize(["workers"], [
+        [None],
+        [2],
+    ])
+    def test_exception(self, workers):
+        document = [{"id": i} for i in range(3000)]
+        document[2500]["id"] = "a"
+
+        with pytest.raises(MultipleInvalid) as e:
+            SchemaValidator(Schema([ITEM_SCHEMA])).validate(
+                document, workers)
+
+        assert e.value.path == [2500, "id"]
+
+
+class Test_SchemaValidator_validate_lazy:
+
+    def test_normal(self):
+        schema = Schema({
+            Required("id"): int,
+            "data": [int],
+        })
+
+        result = SchemaValidator(schema).validate_lazy(
+            {"id": 1, "data": ["a"]})
+        assert isinstance(result, LazyValidatedDict)
+        assert result["id"] == 1
+        assert len(result) == 2
+
+        with pytest.raises(MultipleInvalid) as e:
+            result["data"]
+        assert e.value.path == ["data", 0]
+
+        with pytest.raises(Invalid):
+            result.to_dict()
+
+    def test_normal_contains(self):
+        schema = Schema({Required("id"): int, "data": [int]})
+        result = SchemaValidator(schema).validate_lazy(
+            {"id": 1, "data": ["a"]})
+
+        # membership tests do not validate the values
+        assert "data" in result
+        assert "name" not in result
+        assert result.get("name") is None
+
+        with pytest.raises(MultipleInvalid):
+            result.get("data")
+
+    def test_normal_extra(self):
+        schema = Schema({Optional("id"): int}, extra=ALLOW_EXTRA)
+        result = SchemaValidator(schema).validate_lazy({"a": "b"})
+
+        assert result.to_dict() == {"a": "b"}
+
+    @pytest.mark.parametrize(["schema", "value"], [
+        [Schema([int]), [1]],
+        [Schema({int: int}), {1: 2}],
+        [Schema({Exclusive("a", "g"): int, Exclusive("b", "g"): int}), {}],
+    ])
+    def test_normal_fallback(self, schema, value):
+        assert SchemaValidator(schema).validate_lazy(value) is value
+
+    @pytest.mark.parametrize(["schema", "value"], [
+        [ITEM_SCHEMA, {"name": "a"}],
+        [ITEM_SCHEMA, {"id": 1, "extra": 1}],
+        [ITEM_SCHEMA, [1]],
+        [Schema({"id": int}, required=True), {}],
+    ])
+    def test_exception(self, schema, value):
+        with pytest.raises(Invalid):
+            SchemaValidator(schema).validate_lazy(value)
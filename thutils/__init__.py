@@ -1,12 +1,16 @@
 
 import thutils.cache
 import thutils.common
+import thutils.dumper
 import thutils.gfile
 import thutils.gtime
 import thutils.loader
 import thutils.logger
+import thutils.logscan
 import thutils.main
 import thutils.option
+import thutils.scheduler
+import thutils.validator
 
 
 def initialize_library(
@@ -38,6 +42,6 @@ def initialize_library(
     thutils.logger.logger.debug(
         "complete initialize library: hostname=" + socket.gethostname())
     thutils.logger.logger.debug(
-        "options: " + thutils.common.dump_dict(options.__dict__))
+        "options: " + thutils.common.dump_dict(options.__dict__, lazy=True))
 
     return return_value
@@ -4,9 +4,11 @@
 @author: Tsuyoshi Hombashi
 '''
 
+from __future__ import with_statement
 import datetime
 import os
 import sys
+import threading
 
 import thutils
 from thutils.logger import logger
@@ -27,6 +29,56 @@ class memoize:
             return self.memoized[args]
 
 
+class lru_memoize:
+    """
+    Thread-safe memoize decorator that discards
+    the least recently used results beyond maxsize.
+
+    :param int maxsize: Maximum number of cached results.
+    """
+
+    def __init__(self, maxsize=128):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be greater than 0")
+
+        self.maxsize = maxsize
+
+    def __call__(self, function):
+        import collections
+        import functools
+
+        memoized = collections.OrderedDict()
+        lock = threading.Lock()
+        maxsize = self.maxsize
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            try:
+                with lock:
+                    result = memoized.pop(args)
+                    memoized[args] = result
+
+                return result
+            except KeyError:
+                pass
+            except TypeError:
+                # unhashable arguments can not be cached
+                return function(*args)
+
+            result = function(*args)
+
+            with lock:
+                memoized[args] = result
+                if len(memoized) > maxsize:
+                    memoized.popitem(last=False)
+
+            return result
+
+        wrapper.cache_clear = memoized.clear
+
+        return wrapper
+
+
 class CommandCache:
 
     __CACHE_ROOT_DIR = "/tmp/__thutils__"
@@ -183,48 +183,109 @@ def sleep_wrapper(sleep_second, dry_run=False):
     return sleep_second
 
 
+def _is_fork_process():
+    import multiprocessing
+
+    try:
+        return multiprocessing.get_start_method() == "fork"
+    except AttributeError:
+        # python 2 always forks on POSIX
+        return os.name == "posix"
+
+
+def _is_picklable(value):
+    import pickle
+
+    try:
+        pickle.dumps(value)
+    except Exception:
+        return False
+
+    return True
+
+
 def get_var_name(var, symboltable):
     for name, v in six.iteritems(symboltable):
         if id(v) == id(var):
             return name
 
 
-def dump_dict(dict_input, indent=4):
-    """
-    辞書型変数を文字列に変換して返す
-    """
-
-    dict_work = dict(dict_input)
-    """
-    for key, value in six.iteritems(dict_input):
-        if any([f(value) for f in (is_float, isDict, is_list_or_tuple)]):
-            dict_work[key] = value
-            continue
-
-        try:
-            dict_work[key] = str(value)
-        except:
-            dict_work[key] = str(type(value))
+def _to_dumpable(value):
+    try:
+        return str(value)
+    except Exception:
+        return str(type(value))
 
-        dict_work[key] = _convert_dump_dict(value)
-    """
 
+def _make_dump_func():
     try:
         import json
-        return json.dumps(dict_work, sort_keys=True, indent=indent)
     except ImportError:
-        pass
+        try:
+            import simplejson as json
+        except ImportError:
+            json = None
 
-    try:
-        import simplejson as json
-        return json.dumps(dict_work, sort_keys=True, indent=indent)
-    except ImportError:
-        pass
+    if json is not None:
+        def dump_json(dict_work, indent):
+            return json.dumps(
+                dict_work, sort_keys=True, indent=indent,
+                default=_to_dumpable)
+
+        return dump_json
 
     try:
         import pprint
-        return pprint.pformat(dict_work, indent=indent)
     except ImportError:
-        pass
+        return lambda dict_work, indent: str(dict_work)
+
+    return lambda dict_work, indent: pprint.pformat(dict_work, indent=indent)
+
+
+_dump_func = None
+
+
+def _get_dump_func():
+    global _dump_func
+
+    if _dump_func is None:
+        _dump_func = _make_dump_func()
+
+    return _dump_func
+
+
+class LazyDictDump(object):
+    """
+    Dictionary string conversion deferred until the instance is
+    converted by str(). Concatenation with a preceding string is
+    also deferred.
+    """
+
+    def __init__(self, dict_input, indent=4, header=""):
+        self.__dict_work = dict(dict_input)
+        self.__indent = indent
+        self.__header = header
+
+    def __str__(self):
+        return self.__header + _get_dump_func()(
+            self.__dict_work, self.__indent)
+
+    def __radd__(self, other):
+        return LazyDictDump(
+            self.__dict_work, self.__indent, other + self.__header)
+
+
+def dump_dict(dict_input, indent=4, lazy=False):
+    """
+    辞書型変数を文字列に変換して返す
+    JSON形式に変換できない値は文字列に変換する
+
+    :param bool lazy:
+        If |True|, return LazyDictDump instance that converted
+        to a string only when formatted.
+    """
+
+    if lazy:
+        return LazyDictDump(dict_input, indent)
 
-    return str(dict_work)
+    return _get_dump_func()(dict(dict_input), indent)
@@ -0,0 +1,279 @@
+# encoding: utf-8
+
+'''
+@author: Tsuyoshi Hombashi
+'''
+
+from __future__ import with_statement
+import binascii
+import io
+import os
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import six
+
+import thutils.gfile as gfile
+from thutils.loader import Compression
+from thutils.loader import _replace_file
+from thutils.logger import logger
+
+
+class JsonDumper(object):
+    """
+    Write JSON values to a file incrementally, so the values need not be
+    held in memory at once.
+
+    Values are written to a temporary file in the same directory and
+    the file is renamed to file_path (after fsync) only when the writing
+    completed. The existing file_path is never left half-written.
+    Nothing is written if FileManager is in dry-run mode.
+
+    Usage::
+
+        with JsonDumper("records.json") as dumper:
+            for record in record_iter:
+                dumper.write(record)
+
+    :param str file_path: Output file path.
+    :param str output_format: One of the JsonDumper.Format.
+    :param str compression: One of the thutils.loader.Compression.
+        Not compressed if |None|.
+    :param int buffer_size: Encoded values are buffered up to the size
+        and then written at once.
+    :param bool sort_keys: Same as json.dumps.
+    :param bool is_fsync: Sync the file to the disk before renaming.
+    """
+
+    class Format:
+        ARRAY = "array"
+        JSON_LINES = "jsonl"
+
+    __DEFAULT_BUFFER_SIZE = 1024 ** 2
+
+    @property
+    def file_path(self):
+        return self.__file_path
+
+    @property
+    def write_count(self):
+        return self.__write_count
+
+    def __init__(
+            self, file_path, output_format=Format.ARRAY, compression=None,
+            buffer_size=__DEFAULT_BUFFER_SIZE, sort_keys=False,
+            is_fsync=True):
+        if output_format not in [self.Format.ARRAY, self.Format.JSON_LINES]:
+            raise ValueError("unknown output format: " + str(output_format))
+        if compression not in [
+                None, Compression.GZIP, Compression.BZIP2, Compression.XZ]:
+            raise ValueError("unknown compression: " + str(compression))
+
+        self.__file_path = file_path
+        self.__output_format = output_format
+        self.__compression = compression
+        self.__buffer_size = buffer_size
+        self.__is_fsync = is_fsync
+        self.__encoder = json.JSONEncoder(
+            ensure_ascii=False, sort_keys=sort_keys)
+
+        self.__write_count = 0
+        self.__buffer_list = []
+        self.__buffered_size = 0
+        self.__is_closed = False
+        self.__is_dry_run = gfile.FileManager.is_dry_run()
+        self.__temp_file_path = None
+        self.__raw_fp = None
+        self.__fp = None
+
+        logger.debug("dump JSON: %s" % (file_path))
+
+        if self.__is_dry_run:
+            return
+
+        self.__open()
+        if self.__output_format == self.Format.ARRAY:
+            self.__write_bytes(six.b("["))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, value):
+        """
+        :raises TypeError: value is not JSON serializable.
+        :raises RuntimeError: already closed.
+        """
+
+        if self.__is_closed:
+            raise RuntimeError("write to a closed dumper: " + self.__file_path)
+
+        if self.__is_dry_run:
+            self.__write_count += 1
+            return
+
+        text = self.__encoder.encode(value)
+
+        if self.__output_format == self.Format.ARRAY:
+            if self.__write_count == 0:
+                text = "\n" + text
+            else:
+                text = ",\n" + text
+        else:
+            text += "\n"
+
+        self.__write_bytes(text.encode("utf-8"))
+        self.__write_count += 1
+
+    def write_all(self, value_iter):
+        for value in value_iter:
+            self.write(value)
+
+    def close(self):
+        """
+        Complete the writing and rename the temporary file to file_path.
+        """
+
+        if self.__is_closed:
+            return
+
+        self.__is_closed = True
+
+        if self.__is_dry_run:
+            return
+
+        try:
+            if self.__output_format == self.Format.ARRAY:
+                self.__write_bytes(six.b("\n]\n"))
+            self.__flush()
+            self.__close_file()
+            _replace_file(self.__temp_file_path, self.__file_path)
+        except Exception:
+            try:
+                self.__close_file()
+            finally:
+                self.__remove_temp_file()
+            raise
+
+        if self.__is_fsync:
+            _fsync_directory(os.path.dirname(
+                os.path.abspath(self.__file_path)))
+
+    def abort(self):
+        """
+        Discard the written values. file_path is not changed.
+        """
+
+        if self.__is_closed:
+            return
+
+        self.__is_closed = True
+
+        if self.__is_dry_run:
+            return
+
+        try:
+            self.__close_file()
+        finally:
+            self.__remove_temp_file()
+
+    def __open(self):
+        dir_path = os.path.dirname(os.path.abspath(self.__file_path))
+        if not os.path.isdir(dir_path):
+            raise gfile.FileNotFoundError(dir_path)
+
+        # create with the permissions of the umask like regular files
+        # (tempfile.mkstemp creates files only the owner can read)
+        temp_file_path = "%s.%s.tmp" % (
+            self.__file_path, binascii.hexlify(os.urandom(8)).decode("ascii"))
+        fd = os.open(
+            temp_file_path,
+            os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0),
+            0o666)
+
+        self.__temp_file_path = temp_file_path
+        self.__raw_fp = io.open(fd, "wb")
+        self.__fp = _open_compressor(self.__raw_fp, self.__compression)
+
+    def __write_bytes(self, data):
+        self.__buffer_list.append(data)
+        self.__buffered_size += len(data)
+
+        if self.__buffered_size >= self.__buffer_size:
+            self.__flush()
+
+    def __flush(self):
+        if not self.__buffer_list:
+            return
+
+        self.__fp.write(six.b("").join(self.__buffer_list))
+        self.__buffer_list = []
+        self.__buffered_size = 0
+
+    def __close_file(self):
+        if self.__raw_fp is None:
+            return
+
+        try:
+            if self.__fp is not self.__raw_fp:
+                # flush the remaining compressed data
+                self.__fp.close()
+
+            self.__raw_fp.flush()
+            if self.__is_fsync:
+                os.fsync(self.__raw_fp.fileno())
+        finally:
+            self.__raw_fp.close()
+            self.__raw_fp = None
+            self.__fp = None
+
+    def __remove_temp_file(self):
+        try:
+            os.remove(self.__temp_file_path)
+        except (IOError, OSError):
+            pass
+
+
+def _open_compressor(fp, compression):
+    if compression is None:
+        return fp
+
+    if compression == Compression.GZIP:
+        import gzip
+
+        return gzip.GzipFile(fileobj=fp, mode="wb")
+
+    if compression == Compression.BZIP2:
+        import bz2
+
+        return bz2.BZ2File(fp, "wb")
+
+    if compression == Compression.XZ:
+        import lzma
+
+        return lzma.LZMAFile(fp, "wb")
+
+    raise ValueError("unknown compression: %s" % (compression))
+
+
+def _fsync_directory(dir_path):
+    # make the rename durable. not supported on some platforms (Windows)
+    try:
+        fd = os.open(dir_path, os.O_RDONLY)
+    except (IOError, OSError):
+        return
+
+    try:
+        os.fsync(fd)
+    except (IOError, OSError):
+        pass
+    finally:
+        os.close(fd)
@@ -5,9 +5,13 @@
 '''
 
 from __future__ import with_statement
+import codecs
+import collections
 import os.path
 import re
+import stat
 import sys
+import threading
 
 import dataproperty
 import path
@@ -39,29 +43,378 @@ class EmptyFileError(Exception):
     pass
 
 
+def _make_signature(literal, regexp_text=""):
+    return re.compile(
+        re.escape(six.b(literal)) + six.b(regexp_text), re.DOTALL)
+
+
+class SignatureFileTypeDetector:
+    """
+    Pure Python file type detector: magic number signatures of common
+    formats and a text heuristic over the head of the file.
+    The descriptions of the file types are compatible with libmagic
+    for the common cases (e.g. "ASCII text", "data").
+    """
+
+    #: Size of the head of the file to be examined by default.
+    HEAD_SIZE = 8192
+
+    #: Files with a larger ratio of control bytes are not text.
+    CONTROL_BYTE_RATIO = 0.1
+
+    # (offset, signature, description).
+    # short signatures are followed by the format specific bytes
+    # to avoid matching text files: e.g. "BZh" of "BZh! Hello"
+    __SIGNATURE_LIST = [
+        (0, _make_signature("\x1f\x8b\x08"), "gzip compressed data"),
+        (
+            0, _make_signature("BZh", "[1-9](?:1AY&SY|\x17rE8P\x90)"),
+            "bzip2 compressed data",
+        ),
+        (0, _make_signature("\xfd7zXZ\x00"), "XZ compressed data"),
+        (0, _make_signature("\x28\xb5\x2f\xfd"), "Zstandard compressed data"),
+        (0, _make_signature("7z\xbc\xaf\x27\x1c"), "7-zip archive data"),
+        (0, _make_signature("PK\x03\x04"), "Zip archive data"),
+        (0, _make_signature("PK\x05\x06"), "Zip archive data (empty)"),
+        (0, _make_signature("Rar!\x1a\x07"), "RAR archive data"),
+        (257, _make_signature("ustar", "[\x00 ]"), "POSIX tar archive"),
+        (0, _make_signature("\x89PNG\r\n\x1a\n"), "PNG image data"),
+        (0, _make_signature("\xff\xd8\xff"), "JPEG image data"),
+        (0, _make_signature("GIF8", "[79]a"), "GIF image data"),
+        (0, _make_signature("%PDF-"), "PDF document"),
+        (0, _make_signature("\x7fELF", "[\x01\x02]"), "ELF"),
+        (0, _make_signature("\xcf\xfa\xed\xfe"), "Mach-O 64-bit executable"),
+        (0, _make_signature("SQLite format 3\x00"), "SQLite 3.x database"),
+        (
+            0, _make_signature("\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"),
+            "Composite Document File V2 Document",
+        ),
+        (0, _make_signature("OggS\x00"), "Ogg data"),
+        (
+            0, _make_signature("fLaC", "[\x00\x80]"),
+            "FLAC audio bitstream data",
+        ),
+        (0, _make_signature("ID3", "[\x02-\x04]\x00"), "Audio file with ID3"),
+    ]
+
+    # signatures those consist of printable characters and are too weak to
+    # be told from text: applied only to the data those are not text
+    __BINARY_SIGNATURE_LIST = [
+        (0, _make_signature("MZ"), "MS-DOS executable"),
+        (0, _make_signature("RIFF"), "RIFF data"),
+    ]
+
+    __BOM_LIST = [
+        (codecs.BOM_UTF32_LE, "UTF-32 Unicode text"),
+        (codecs.BOM_UTF32_BE, "UTF-32 Unicode text"),
+        (codecs.BOM_UTF16_LE, "UTF-16 Unicode text"),
+        (codecs.BOM_UTF16_BE, "UTF-16 Unicode text"),
+    ]
+
+    # bytes of text files: printable characters, non-ASCII bytes and
+    # control characters those commonly appear in text files
+    # (BEL, BS, TAB, LF, VT, FF, CR, ESC)
+    __TEXT_BYTES = bytes(bytearray(
+        [7, 8, 9, 10, 11, 12, 13, 27] +
+        list(range(0x20, 0x7f)) + list(range(0x80, 0x100))))
+    __ASCII_BYTES = bytes(bytearray(range(0x80)))
+
+    @classmethod
+    def detect(cls, file_path, head_size=None):
+        """
+        Symbolic links are not followed as well as libmagic.
+
+        :param int head_size: Size of the head of the file to be examined.
+            Defaults to HEAD_SIZE.
+        :return: Description of the file type.
+        :rtype: str
+        :raises OSError:
+        """
+
+        if head_size is None:
+            head_size = cls.HEAD_SIZE
+
+        mode = os.lstat(file_path).st_mode
+        if stat.S_ISLNK(mode):
+            return "symbolic link to " + os.readlink(file_path)
+        if stat.S_ISDIR(mode):
+            return "directory"
+        if not stat.S_ISREG(mode):
+            # do not open: reading a fifo or a device may block
+            for is_file_type, description in [
+                (stat.S_ISFIFO, "fifo (named pipe)"),
+                (stat.S_ISSOCK, "socket"),
+                (stat.S_ISCHR, "character special"),
+                (stat.S_ISBLK, "block special"),
+            ]:
+                if is_file_type(mode):
+                    return description
+
+        # the path may be replaced by a symbolic link after the lstat
+        fd = os.open(
+            file_path,
+            os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0) |
+            getattr(os, "O_BINARY", 0))
+        with os.fdopen(fd, "rb") as fp:
+            head = fp.read(head_size + 1)
+
+        return cls.detect_buffer(
+            head[:head_size], is_truncated=len(head) > head_size)
+
+    @classmethod
+    def detect_buffer(cls, buf, is_truncated=False):
+        """
+        :param bytes buf: Head of the data.
+        :param bool is_truncated: |True| if the data continues after buf.
+        :return: Description of the file type.
+        :rtype: str
+        """
+
+        if not buf:
+            return "empty"
+
+        buf = bytes(buf)
+
+        for offset, re_signature, description in cls.__SIGNATURE_LIST:
+            if re_signature.match(buf, offset) is not None:
+                return description
+
+        for bom, description in cls.__BOM_LIST:
+            if buf.startswith(bom):
+                return description
+
+        file_type = cls.__detect_text(buf, is_truncated)
+        if file_type != FileTypeChecker.FileType.BINARY:
+            return file_type
+
+        for offset, re_signature, description in cls.__BINARY_SIGNATURE_LIST:
+            if re_signature.match(buf, offset) is not None:
+                return description
+
+        return file_type
+
+    @classmethod
+    def __detect_text(cls, buf, is_truncated):
+        if six.b("\0") in buf:
+            return FileTypeChecker.FileType.BINARY
+
+        # translate deletes the bytes in C: the rest are the control bytes
+        control_count = len(buf.translate(None, cls.__TEXT_BYTES))
+        if control_count > len(buf) * cls.CONTROL_BYTE_RATIO:
+            return FileTypeChecker.FileType.BINARY
+
+        if not buf.translate(None, cls.__ASCII_BYTES):
+            return FileTypeChecker.FileType.TEXT
+
+        # a multi-byte character may be split at the end of the buffer
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            decoder.decode(buf, final=not is_truncated)
+        except UnicodeDecodeError:
+            return "ISO-8859 text"
+
+        return "UTF-8 Unicode text"
+
+
 class FileTypeChecker:
 
     class FileType:
         TEXT = "ASCII text"
         BINARY = "data"
 
+    class Backend:
+        """
+        - MAGIC: libmagic (python-magic).
+        - SIGNATURE: SignatureFileTypeDetector. Much faster and
+          does not need libmagic, but knows only common formats.
+        """
+
+        MAGIC = "magic"
+        SIGNATURE = "signature"
+
+    __BATCH_CHUNK_SIZE = 16
+
+    #: File type detector used by default.
+    backend = Backend.MAGIC
+
+    #: Maximum number of the cached file types.
+    cache_size = 4096
+
     __re_text = re.compile(FileType.TEXT)
 
+    # libmagic handles are not thread-safe: a handle per thread
+    __thread_local = threading.local()
+
+    __cache_lock = threading.Lock()
+    __cache_table = collections.OrderedDict()
+
     @classmethod
-    def get_file_type(cls, file_path):
-        import magic
+    def get_file_type(cls, file_path, head_size=None, backend=None):
+        """
+        :param int head_size: If specified, classify by only the first
+            head_size bytes of the file.
+        :param str backend: One of the FileTypeChecker.Backend.
+            Defaults to FileTypeChecker.backend.
+        :return: Description of the file type.
+            Results are cached while (device, inode, size, mtime)
+            of the file is unchanged.
+        """
+
+        if backend is None:
+            backend = cls.backend
+        if backend not in [cls.Backend.MAGIC, cls.Backend.SIGNATURE]:
+            raise ValueError("unknown backend: " + str(backend))
+
+        stat_key = _get_stat_key(file_path)
+        if stat_key is not None:
+            cache_key = (stat_key, head_size, backend)
+
+            with cls.__cache_lock:
+                file_type = cls.__cache_table.pop(cache_key, None)
+                if file_type is not None:
+                    cls.__cache_table[cache_key] = file_type
+                    return file_type
+
+        if backend == cls.Backend.SIGNATURE:
+            file_type = SignatureFileTypeDetector.detect(
+                file_path, head_size)
+        elif head_size is None:
+            file_type = cls.__get_magic().from_file(file_path)
+        else:
+            with open(file_path, "rb") as fp:
+                file_type = cls.__get_magic().from_buffer(
+                    fp.read(head_size))
 
-        return magic.from_file(file_path)
+        # the file modified while checking is not cached
+        if stat_key is not None and _get_stat_key(file_path) == stat_key:
+            with cls.__cache_lock:
+                cls.__cache_table[cache_key] = file_type
+                while len(cls.__cache_table) > max(cls.cache_size, 0):
+                    cls.__cache_table.popitem(last=False)
+
+        return file_type
 
     @classmethod
-    def is_text_file(cls, file_path):
-        try:
-            file_type_text = cls.get_file_type(file_path).decode("utf-8")
-        except UnicodeDecodeError:
-            return False
+    def is_text_file(cls, file_path, backend=None):
+        file_type_text = cls.get_file_type(file_path, backend=backend)
+
+        if isinstance(file_type_text, six.binary_type):
+            try:
+                file_type_text = file_type_text.decode("utf-8")
+            except UnicodeDecodeError:
+                return False
 
         return cls.__re_text.search(file_type_text) is not None
 
+    @classmethod
+    def iter_file_type(
+            cls, file_path_iter, workers=None, use_process=False,
+            head_size=None, backend=None):
+        """
+        Classify files by a thread or process pool.
+        Each worker has its own libmagic handle.
+
+        :param file_path_iter: Paths of the files to be classified.
+        :param int workers: Number of workers.
+            Classify sequentially if |None| or less than 2.
+        :param bool use_process: Use process pool instead of thread pool.
+        :param int head_size: Same as get_file_type.
+        :param str backend: Same as get_file_type.
+        :return: Iterator of (path, file type) in order of completion.
+            The file type is |None| if failed to classify the file.
+        """
+
+        if backend is None:
+            backend = cls.backend
+
+        arg_iter = (
+            (file_path, head_size, backend) for file_path in file_path_iter)
+
+        if workers is None or workers < 2:
+            for arg_list in arg_iter:
+                yield _get_file_type_worker(arg_list)
+
+            return
+
+        import multiprocessing
+        import multiprocessing.pool
+
+        if use_process:
+            pool = multiprocessing.Pool(workers)
+        else:
+            pool = multiprocessing.pool.ThreadPool(workers)
+
+        try:
+            for result in pool.imap_unordered(
+                    _get_file_type_worker, arg_iter,
+                    cls.__BATCH_CHUNK_SIZE):
+                yield result
+        finally:
+            pool.terminate()
+            pool.join()
+
+    @classmethod
+    def clear_cache(cls):
+        with cls.__cache_lock:
+            cls.__cache_table.clear()
+
+    @classmethod
+    def __get_magic(cls):
+        handle = getattr(cls.__thread_local, "magic", None)
+        if handle is None:
+            import magic
+
+            # initializing libmagic (loading the database) is expensive
+            handle = magic.Magic()
+            cls.__thread_local.magic = handle
+
+        return handle
+
+
+def _get_file_type_worker(arg_list):
+    file_path, head_size, backend = arg_list
+
+    try:
+        return (
+            file_path,
+            FileTypeChecker.get_file_type(file_path, head_size, backend))
+    except Exception:
+        _, e, _ = sys.exc_info()  # for python 2.5 compatibility
+        logger.debug("failed to classify: %s: %s" % (file_path, str(e)))
+
+        return (file_path, None)
+
+
+def _get_stat_key(path, follow_symlinks=False):
+    """
+    Key to detect modifications of a file, e.g. to invalidate caches.
+
+    :param bool follow_symlinks: stat the target of a symbolic link
+        instead of the link itself.
+    :return: (device, inode, size, mtime_ns, file type) of the path.
+        The file type is stat.S_IFMT of the mode.
+        |None| if failed to stat.
+    :rtype: tuple
+    """
+
+    try:
+        if follow_symlinks:
+            stat_result = os.stat(path)
+        else:
+            stat_result = os.lstat(path)
+    except (IOError, OSError, TypeError, ValueError):
+        return None
+
+    try:
+        mtime_ns = stat_result.st_mtime_ns
+    except AttributeError:
+        # st_mtime_ns is not available before python 3.3
+        mtime_ns = int(stat_result.st_mtime * 10 ** 9)
+
+    return (
+        stat_result.st_dev, stat_result.st_ino, stat_result.st_size,
+        mtime_ns, stat.S_IFMT(stat_result.st_mode))
+
 
 class FileManager:
     __dry_run = False
@@ -70,6 +423,10 @@ class FileManager:
     def initialize(cls, dry_run):
         cls.__dry_run = dry_run
 
+    @classmethod
+    def is_dry_run(cls):
+        return cls.__dry_run
+
     @classmethod
     def touch(cls, touch_path):
         logger.debug("touch file: " + touch_path)
@@ -354,27 +711,119 @@ def findFile(search_root_dir_path, re_pattern_text):
 def findFileAll(
         search_root_dir_path, check_func,
         re_pattern_text, find_count=six.MAXSIZE):
+    """
+    Search files/directories whose names match re_pattern_text
+    under search_root_dir_path in the same order as os.walk.
+
+    :param check_func: Function that takes a path and returns |True| for
+        the paths to be found. os.path.isfile and os.path.isdir are
+        answered by the file types that scandir cached, without stat calls.
+    """
 
     re_compile = re.compile(re_pattern_text)
+
+    scandir = _get_scandir()
+    if scandir is None:
+        path_iter = _iter_walk_path(
+            search_root_dir_path, re_compile, check_func)
+    else:
+        path_iter = _iter_scandir_path(
+            scandir, search_root_dir_path, re_compile, check_func)
+
     path_list = []
+    for path in path_iter:
+        path_list.append(path)
+
+        if len(path_list) >= find_count:
+            return path_list
+
+    logger.debug("find file result: count=%d, files=(%s)" % (
+        len(path_list), ", ".join(path_list)))
+    return path_list
+
 
+def _get_scandir():
+    try:
+        return os.scandir
+    except AttributeError:
+        pass
+
+    try:
+        # backport for python < 3.5
+        from scandir import scandir
+    except ImportError:
+        return None
+
+    return scandir
+
+
+def _iter_walk_path(search_root_dir_path, re_compile, check_func):
     for dir_path, dir_name_list, filename_list in os.walk(search_root_dir_path):
         for file_name in dir_name_list + filename_list:
-            path = os.path.join(dir_path, file_name)
-            if not check_func(path):
+            if re_compile.search(file_name) is None:
                 continue
 
-            if re_compile.search(file_name) is None:
+            path = os.path.join(dir_path, file_name)
+            if check_func(path):
+                yield path
+
+
+def _iter_scandir_path(scandir, search_root_dir_path, re_compile, check_func):
+    if check_func is os.path.isfile:
+        def entry_check_func(entry):
+            return entry.is_file()
+    elif check_func is os.path.isdir:
+        def entry_check_func(entry):
+            return entry.is_dir()
+    else:
+        def entry_check_func(entry):
+            return check_func(entry.path)
+
+    # depth-first pre-order without recursion, the same order as os.walk:
+    # directories then files of a directory, and then the sub-directories
+    dir_path_stack = [search_root_dir_path]
+
+    while dir_path_stack:
+        dir_path = dir_path_stack.pop()
+
+        try:
+            entry_list = list(scandir(dir_path))
+        except OSError:
+            # same as os.walk: skip the directories that can not be read
+            continue
+
+        dir_entry_list = []
+        file_entry_list = []
+        for entry in entry_list:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                dir_entry_list.append(entry)
+            else:
+                file_entry_list.append(entry)
+
+        for entry in dir_entry_list + file_entry_list:
+            if re_compile.search(entry.name) is None:
                 continue
 
-            path_list.append(path)
+            if entry_check_func(entry):
+                yield entry.path
 
-            if len(path_list) >= find_count:
-                return path_list
+        sub_dir_path_list = []
+        for entry in dir_entry_list:
+            try:
+                # same as os.walk: do not follow symbolic links
+                if entry.is_symlink():
+                    continue
+            except OSError:
+                continue
 
-    logger.debug("find file result: count=%d, files=(%s)" % (
-        len(path_list), ", ".join(path_list)))
-    return path_list
+            sub_dir_path_list.append(entry.path)
+
+        dir_path_stack.extend(reversed(sub_dir_path_list))
 
 
 def findDirectory(search_root_dir_path, re_pattern, find_count=-1):
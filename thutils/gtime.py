@@ -4,8 +4,13 @@
 @author: Tsuyoshi Hombashi
 '''
 
+import datetime
+import re
 
 import dataproperty
+import six
+
+from thutils.cache import lru_memoize
 
 
 class RegularExpression:
@@ -37,6 +42,8 @@ class Format:
         DATE = "%Y-%m-%d"
         TIME = "%H:%M:%S"
         DATETIME = " ".join([DATE, TIME])
+        TIMEZONE = "%z"
+        DATETIME_WITH_TZ = " ".join([DATETIME, TIMEZONE])
 
     ISO_DATETIME_LIST = [
         ISO.DATETIME,
@@ -51,18 +58,205 @@ class Format:
     JST_DATE = "%Y/%m/%d"
 
 
-def getTimeUnitSecondsCoefficient(unit):
-    unit = unit.lower()
+_timezone_cache = {}
+
+
+def _get_fixed_timezone(offset_minute):
+    try:
+        return _timezone_cache[offset_minute]
+    except KeyError:
+        pass
+
+    tzinfo = datetime.timezone(datetime.timedelta(minutes=offset_minute))
+    _timezone_cache[offset_minute] = tzinfo
+
+    return tzinfo
+
+
+def _make_fast_parser(regexp_text):
+    re_datetime = re.compile(regexp_text + "\\Z")
+
+    def parse(value):
+        match = re_datetime.match(value)
+        if match is None:
+            return None
+
+        try:
+            return datetime.datetime(*[int(v) for v in match.groups()])
+        except ValueError:
+            return None
+
+    return parse
+
+
+def _make_fast_tz_parser(regexp_text):
+    re_datetime = re.compile(regexp_text + "([+-])([0-9]{2})([0-9]{2})\\Z")
+
+    def parse(value):
+        match = re_datetime.match(value)
+        if match is None:
+            return None
+
+        group_list = match.groups()
+        tz_minute = int(group_list[-1])
+        if tz_minute >= 60:
+            # strptime rejects as well
+            return None
+
+        offset_minute = int(group_list[-2]) * 60 + tz_minute
+        if group_list[-3] == "-":
+            offset_minute = -offset_minute
+
+        try:
+            # offsets must be shorter than 24 hours
+            return datetime.datetime(*[int(v) for v in group_list[:-3]] + [
+                0, _get_fixed_timezone(offset_minute)])
+        except ValueError:
+            return None
+
+    return parse
+
+
+_YMD_HMS_FORMAT = (
+    "([0-9]{4})%s([0-9]{2})%s([0-9]{2})%s"
+    "([0-9]{2})%s([0-9]{2})%s([0-9]{2})")
+
+# superset of the values those strptime accepts for the formats:
+# non-padded (or space-padded) fields and variants of the UTC offset
+_YMD_HMS_LOOSE_FORMAT = (
+    "[0-9]{4}%s\\s*[0-9]{1,2}%s\\s*[0-9]{1,2}%s"
+    "\\s*[0-9]{1,2}%s\\s*[0-9]{1,2}%s\\s*[0-9]{1,2}")
+_TZ_LOOSE_REGEXP = (
+    "(?:[+-][0-9]{2}:?[0-9]{2}(?::?[0-9]{2}(?:\\.[0-9]{1,6})?)?|Z)")
+
+# hand-written parsers for fixed-width formats: much faster than strptime.
+# (fast parser, regular expression of the values those need strptime)
+_FAST_PARSER_TABLE = {}
+
+
+def _to_loose_separator(separator):
+    if separator == " ":
+        # whitespaces of formats match any number of whitespaces
+        return "\\s+"
+
+    return re.escape(separator)
+
+
+def _register_fast_parser(datetime_format, separator_list, tz_separator=None):
+    regexp_text = _YMD_HMS_FORMAT % tuple(separator_list)
+    loose_regexp_text = _YMD_HMS_LOOSE_FORMAT % tuple(
+        [_to_loose_separator(separator) for separator in separator_list])
+
+    if tz_separator is None:
+        fast_parser = _make_fast_parser(regexp_text)
+    else:
+        fast_parser = _make_fast_tz_parser(regexp_text + tz_separator)
+        loose_regexp_text += (
+            _to_loose_separator(tz_separator) + _TZ_LOOSE_REGEXP)
+
+    _FAST_PARSER_TABLE[datetime_format] = (
+        fast_parser, re.compile(loose_regexp_text + "\\Z", re.IGNORECASE))
+
+
+_register_fast_parser(Format.ISO.DATETIME, ["-", "-", " ", ":", ":"])
+_register_fast_parser(
+    Format.ISO8601.Basic.DATETIME, ["", "", "T", "", ""])
+_register_fast_parser(
+    " ".join([Format.JST_DATE, Format.ISO.TIME]), ["/", "/", " ", ":", ":"])
+if hasattr(datetime, "timezone"):
+    _register_fast_parser(
+        Format.ISO8601.Extended.DATETIME, ["-", "-", "T", ":", ":"], "")
+    _register_fast_parser(
+        Format.ISO.DATETIME_WITH_TZ, ["-", "-", " ", ":", ":"], " ")
+
+
+class DateTimeParser(object):
+    """
+    Parse datetime strings with format auto-detection.
+    The format of the last successfully parsed value is tried first,
+    and the other formats are tried only when it fails.
+
+    :param list format_list: Candidate datetime formats.
+        Defaults to Format.DATETIME_LIST.
+    """
+
+    @property
+    def format_list(self):
+        return self.__format_list
+
+    @property
+    def last_format(self):
+        return self.__last_format
+
+    def __init__(self, format_list=None):
+        if format_list is None:
+            format_list = Format.DATETIME_LIST
+
+        if dataproperty.is_empty_list_or_tuple(format_list):
+            raise ValueError("empty format list")
+
+        self.__format_list = list(format_list)
+        self.__last_format = None
+
+    def parse(self, value):
+        """
+        :rtype: datetime.datetime
+        :raises ValueError: value does not match any of the formats.
+        """
+
+        last_format = self.__last_format
+        if last_format is not None:
+            dt = self.__parse(value, last_format)
+            if dt is not None:
+                return dt
+
+        for datetime_format in self.__format_list:
+            if datetime_format == last_format:
+                continue
+
+            dt = self.__parse(value, datetime_format)
+            if dt is not None:
+                self.__last_format = datetime_format
+                return dt
+
+        raise ValueError("unknown datetime format: " + str(value))
+
+    @staticmethod
+    def __parse(value, datetime_format):
+        fast_parser_pair = _FAST_PARSER_TABLE.get(datetime_format)
+        if fast_parser_pair is not None:
+            fast_parser, re_strptime_value = fast_parser_pair
+            dt = fast_parser(value)
+            if dt is not None:
+                return dt
 
-    unit_table = {
-        "s": 1,
-        "m": 60,
-        "h": 60 ** 2,
-        "d": 60 ** 2 * 24,
-        "w": 60 ** 2 * 24 * 7,
-    }
+            # strptime fails too unless the value is a variant that the
+            # fast parser does not accept: e.g. "2016-1-2 3:4:5".
+            # avoid raising strptime for each value of mixed formats
+            if re_strptime_value.match(value) is None:
+                return None
 
-    coef_second = unit_table.get(unit)
+        try:
+            return datetime.datetime.strptime(value, datetime_format)
+        except ValueError:
+            return None
+
+
+_TIME_UNIT_SECOND_TABLE = {
+    "s": 1,
+    "m": 60,
+    "h": 60 ** 2,
+    "d": 60 ** 2 * 24,
+    "w": 60 ** 2 * 24 * 7,
+}
+# sizes are unsigned (or "+") decimal numbers with an optional exponent
+_re_duration = re.compile(
+    "\\s*(\\+?(?:[0-9]+(?:\\.[0-9]*)?|\\.[0-9]+)(?:e[+-]?[0-9]+)?)"
+    "\\s*([smhdw])\\s*", re.IGNORECASE)
+
+
+def getTimeUnitSecondsCoefficient(unit):
+    coef_second = _TIME_UNIT_SECOND_TABLE.get(unit.lower())
 
     if coef_second is None:
         raise ValueError("invalid unit: " + str(unit))
@@ -70,14 +264,586 @@ def getTimeUnitSecondsCoefficient(unit):
     return coef_second
 
 
+@lru_memoize(maxsize=1024)
 def convertHumanReadableToSecond(readable_time):
+    """
+    Convert a duration string to seconds.
+    Compound durations are accepted: e.g. "1h30m15s", "1.5h", "2d 12h"
+    Sizes may have a "+" sign and an exponent: e.g. "+5m", "1e3s".
+    Negative sizes, "inf" and "nan" are not accepted.
+
+    :rtype: float
+    :raises ValueError: invalid duration string.
+    """
+
     if dataproperty.is_empty_string(readable_time):
         raise ValueError("empty input")
 
-    size = float(readable_time[:-1])
-    unit = readable_time[-1]
+    second = 0.0
+    pos = 0
+    length = len(readable_time)
+
+    while pos < length:
+        match = _re_duration.match(readable_time, pos)
+        if match is None:
+            raise ValueError("invalid duration: " + readable_time)
+
+        size, unit = match.groups()
+        second += float(size) * _TIME_UNIT_SECOND_TABLE[unit.lower()]
+        pos = match.end()
+
+    return second
+
+
+def convertHumanReadableToSecondList(readable_time_list):
+    """
+    Convert multiple duration strings to seconds.
+
+    :rtype: list of float
+    :raises ValueError: invalid duration string included.
+    """
+
+    return [
+        convertHumanReadableToSecond(readable_time)
+        for readable_time in readable_time_list
+    ]
+
+
+_ISO_DATETIME_LENGTH = 19
+_ISO_DATETIME_WITH_TZ_LENGTH = 25
+_re_iso_datetime = re.compile(
+    "([0-9]{4})-([0-9]{2})-([0-9]{2}) ([0-9]{2}):([0-9]{2}):([0-9]{2})"
+    "(?: ([+-])([0-9]{2})([0-9]{2}))?\\Z")
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _days_from_civil(year, month, day):
+    """
+    Number of days since 1970-01-01 in the proleptic Gregorian calendar.
+    Works for both int and numpy integer array arguments.
+    """
+
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + 9 - 12 * (month > 2)) + 2) // 5 + day - 1
+    day_of_era = (
+        year_of_era * 365 + year_of_era // 4 - year_of_era // 100 +
+        day_of_year)
+
+    return era * 146097 + day_of_era - 719468
+
+
+def _is_leap_year(year):
+    return (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+
+
+def _check_value_list(value_list):
+    # a string is a sequence of characters: reject it as numpy does not
+    # iterate over it
+    if isinstance(value_list, (six.string_types, six.binary_type)):
+        raise TypeError("expected sequence of strings, but got a string")
+
+
+def _to_epoch_list(value_list):
+    _check_value_list(value_list)
+
+    epoch_list = []
+
+    for value in value_list:
+        if not isinstance(value, six.string_types):
+            raise TypeError("expected sequence of strings")
+
+        match = _re_iso_datetime.match(value)
+        if match is None:
+            raise ValueError("invalid datetime format: " + str(value))
+
+        (year, month, day, hour, minute, second, sign,
+         tz_hour, tz_minute) = match.groups()
+        year, month, day = int(year), int(month), int(day)
+        hour, minute, second = int(hour), int(minute), int(second)
+
+        if not 1 <= month <= 12:
+            raise ValueError("invalid month: " + value)
+        days_in_month = _DAYS_IN_MONTH[month] + (
+            month == 2 and _is_leap_year(year))
+        if any([
+            not 1 <= day <= days_in_month,
+            hour >= 24, minute >= 60, second >= 60,
+        ]):
+            raise ValueError("invalid datetime: " + value)
+
+        epoch = (
+            _days_from_civil(year, month, day) * 86400 +
+            hour * 3600 + minute * 60 + second)
+
+        if sign is not None:
+            offset_second = int(tz_hour) * 3600 + int(tz_minute) * 60
+            if sign == "+":
+                epoch -= offset_second
+            else:
+                epoch += offset_second
+
+        epoch_list.append(epoch)
+
+    return epoch_list
+
+
+def _to_epoch_ndarray(value_list, numpy):
+    _check_value_list(value_list)
+
+    if not isinstance(value_list, numpy.ndarray):
+        value_list = list(value_list)
+
+        # check the types before numpy.asarray converts the values to
+        # strings: the same values as _to_epoch_list are accepted
+        for value_type in set(map(type, value_list)):
+            if not issubclass(value_type, six.string_types):
+                raise TypeError("expected sequence of strings")
+
+    value_array = numpy.asarray(value_list)
+    if value_array.ndim != 1:
+        raise TypeError("expected one-dimensional sequence of strings")
+    if value_array.size == 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+
+    # bytes are not accepted as well as _to_epoch_list (str of python 2 is)
+    if value_array.dtype.kind != "U" and not (
+            six.PY2 and value_array.dtype.kind == "S"):
+        raise TypeError("expected sequence of strings")
+
+    length_array = numpy.char.str_len(value_array).ravel()
+    is_tz = length_array == _ISO_DATETIME_WITH_TZ_LENGTH
+    if not numpy.all(is_tz | (length_array == _ISO_DATETIME_LENGTH)):
+        raise ValueError("invalid datetime length")
+
+    # character code matrix: one row per datetime string
+    code_matrix = value_array.astype(
+        "U%d" % (_ISO_DATETIME_WITH_TZ_LENGTH)).ravel().view(
+        numpy.uint32).reshape(-1, _ISO_DATETIME_WITH_TZ_LENGTH).astype(
+        numpy.int64)
+    digit_matrix = code_matrix - ord("0")
+
+    def to_int(begin, end):
+        int_array = numpy.zeros(len(digit_matrix), dtype=numpy.int64)
+        for i in range(begin, end):
+            int_array = int_array * 10 + digit_matrix[:, i]
+
+        return int_array
+
+    digit_column_list = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+    separator_list = [(4, "-"), (7, "-"), (10, " "), (13, ":"), (16, ":")]
+    is_valid = numpy.all(
+        (digit_matrix[:, digit_column_list] >= 0) &
+        (digit_matrix[:, digit_column_list] <= 9), axis=1)
+    for column, separator in separator_list:
+        is_valid &= code_matrix[:, column] == ord(separator)
+
+    tz_digit_matrix = digit_matrix[:, [21, 22, 23, 24]]
+    is_valid &= ~is_tz | (
+        (code_matrix[:, 19] == ord(" ")) &
+        ((code_matrix[:, 20] == ord("+")) | (code_matrix[:, 20] == ord("-"))) &
+        numpy.all((tz_digit_matrix >= 0) & (tz_digit_matrix <= 9), axis=1))
+
+    year, month, day = to_int(0, 4), to_int(5, 7), to_int(8, 10)
+    hour, minute, second = to_int(11, 13), to_int(14, 16), to_int(17, 19)
+
+    days_in_month = numpy.asarray(_DAYS_IN_MONTH)[
+        numpy.clip(month, 0, 12)] + ((month == 2) & _is_leap_year(year))
+    is_valid &= (
+        (month >= 1) & (month <= 12) & (day >= 1) & (day <= days_in_month) &
+        (hour < 24) & (minute < 60) & (second < 60))
+
+    if not numpy.all(is_valid):
+        invalid_index = int(numpy.argmin(is_valid))
+        raise ValueError(
+            "invalid datetime: " + str(value_array.ravel()[invalid_index]))
+
+    epoch_array = (
+        _days_from_civil(year, month, day) * 86400 +
+        hour * 3600 + minute * 60 + second)
+
+    offset_second = numpy.where(
+        is_tz, to_int(21, 23) * 3600 + to_int(23, 25) * 60, 0)
+    offset_second = numpy.where(
+        code_matrix[:, 20] == ord("-"), -offset_second, offset_second)
+
+    return epoch_array - offset_second
+
+
+def to_epoch_array(value_list):
+    """
+    Convert ISO datetime strings to UNIX epoch seconds at once,
+    without creating datetime objects.
+    Values should match RegularExpression.ISO.DATETIME or
+    RegularExpression.ISO.DATETIME_WITH_TZ.
+    Values without the timezone are treated as UTC.
+
+    :param list value_list: ISO datetime strings.
+    :return:
+        numpy.ndarray of int64 if numpy is installed,
+        list of int otherwise.
+    :raises TypeError: value_list is not a flat sequence of strings
+        (e.g. a string itself, bytes values or nested sequences).
+    :raises ValueError: invalid datetime string included.
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        return _to_epoch_list(value_list)
+
+    return _to_epoch_ndarray(value_list, numpy)
+
+
+def to_datetime64_array(value_list):
+    """
+    Convert ISO datetime strings to a numpy datetime64[s] array (UTC).
+    Accepted values are the same as to_epoch_array.
+
+    :rtype: numpy.ndarray
+    :raises ImportError: numpy is not installed.
+    :raises ValueError: invalid datetime string included.
+    """
+
+    import numpy
+
+    return _to_epoch_ndarray(value_list, numpy).astype("datetime64[s]")
+
+
+def _to_epoch(timestamp):
+    """
+    :param timestamp: datetime (naive datetime is treated as UTC)
+        or UNIX epoch seconds.
+    """
+
+    if isinstance(timestamp, datetime.datetime):
+        import calendar
+
+        if timestamp.utcoffset() is not None:
+            timestamp = timestamp - timestamp.utcoffset()
+
+        return calendar.timegm(timestamp.timetuple()) + (
+            timestamp.microsecond / 1000000.0)
+
+    return timestamp
+
+
+class TimeBucketAggregator(object):
+    """
+    Streaming aggregation of (timestamp, value) pairs into fixed-width
+    time buckets. Count, sum, minimum and maximum of the values are kept
+    per bucket in compact arrays, so memory usage depends on the number
+    of buckets, not on the number of the pairs.
+
+    :param str bucket_width: Width of a bucket. e.g. "1m", "1h", "1d"
+    """
+
+    @property
+    def bucket_second(self):
+        return self.__bucket_second
+
+    def __init__(self, bucket_width="1m"):
+        import array
+
+        self.__bucket_second = convertHumanReadableToSecond(bucket_width)
+        if self.__bucket_second <= 0:
+            raise ValueError("bucket width must be greater than 0")
+
+        self.__slot_table = {}  # bucket index -> array index
+        self.__count_array = array.array("L")
+        self.__sum_array = array.array("d")
+        self.__min_array = array.array("d")
+        self.__max_array = array.array("d")
+
+    def __len__(self):
+        return len(self.__slot_table)
+
+    def add(self, timestamp, value=1):
+        """
+        :param timestamp: datetime (naive datetime is treated as UTC)
+            or UNIX epoch seconds.
+        :param float value: Value to be aggregated.
+        """
+
+        self.__add_bucket(
+            int(_to_epoch(timestamp) // self.__bucket_second),
+            1, value, value, value)
+
+    def add_all(self, timestamp_value_pairs):
+        for timestamp, value in timestamp_value_pairs:
+            self.add(timestamp, value)
+
+    def merge(self, other):
+        """
+        Merge partial aggregate results (e.g. from parallel workers).
+
+        :param TimeBucketAggregator other: Aggregator with
+            the same bucket width.
+        """
+
+        if self.__bucket_second != other.bucket_second:
+            raise ValueError("bucket width mismatch: %s != %s" % (
+                self.__bucket_second, other.bucket_second))
+
+        for bucket_index, count, value_sum, value_min, value_max in (
+                other.__iter_bucket()):
+            self.__add_bucket(
+                bucket_index, count, value_sum, value_min, value_max)
+
+        return self
+
+    def iter_bucket(self):
+        """
+        Yield aggregate results in order of time.
+
+        :return: (bucket start epoch seconds, count, sum, min, max)
+        :rtype: tuple
+        """
+
+        for bucket_index, count, value_sum, value_min, value_max in sorted(
+                self.__iter_bucket()):
+            yield (
+                bucket_index * self.__bucket_second,
+                count, value_sum, value_min, value_max)
+
+    def __iter_bucket(self):
+        for bucket_index, slot in self.__slot_table.items():
+            yield (
+                bucket_index,
+                self.__count_array[slot], self.__sum_array[slot],
+                self.__min_array[slot], self.__max_array[slot])
+
+    def __add_bucket(
+            self, bucket_index, count, value_sum, value_min, value_max):
+        slot = self.__slot_table.get(bucket_index)
+
+        if slot is None:
+            self.__slot_table[bucket_index] = len(self.__count_array)
+            self.__count_array.append(count)
+            self.__sum_array.append(value_sum)
+            self.__min_array.append(value_min)
+            self.__max_array.append(value_max)
+            return
+
+        self.__count_array[slot] += count
+        self.__sum_array[slot] += value_sum
+        if value_min < self.__min_array[slot]:
+            self.__min_array[slot] = value_min
+        if value_max > self.__max_array[slot]:
+            self.__max_array[slot] = value_max
+
+
+# origin of time unit alignment: Monday, to align weeks on Monday
+_ALIGN_ORIGIN_DATETIME = datetime.datetime(1970, 1, 5)
+
+
+def split_time_range(
+        start_datetime, end_datetime, split_count=None, unit=None,
+        overlap_second=0):
+    """
+    Split a time range [start, end) into windows.
+    Either split_count or unit is required.
+
+    :param int split_count: Split into the number of equal length windows.
+    :param str unit: Split at the boundaries of the time unit
+        (a unit of getTimeUnitSecondsCoefficient. e.g. "h", "d").
+        Boundaries are aligned on the wall-clock time.
+    :param float overlap_second: Extend each window by the seconds
+        on both sides within [start, end).
+    :return: List of (window start, window end) pairs.
+    :rtype: list of tuple
+    :raises ValueError: invalid arguments.
+    """
+
+    parser = DateTimeParser()
+    if not isinstance(start_datetime, datetime.datetime):
+        start_datetime = parser.parse(start_datetime)
+    if not isinstance(end_datetime, datetime.datetime):
+        end_datetime = parser.parse(end_datetime)
+
+    if start_datetime >= end_datetime:
+        raise ValueError("start datetime must be earlier than end datetime")
+    if overlap_second < 0:
+        raise ValueError("minus overlap")
+    if (split_count is None) == (unit is None):
+        raise ValueError("either split count or unit is required")
+
+    if split_count is not None:
+        if split_count < 1:
+            raise ValueError("split count must be greater than 0")
+
+        window = (end_datetime - start_datetime) // split_count
+        boundary_list = [
+            start_datetime + window * i for i in range(split_count)]
+    else:
+        unit_second = getTimeUnitSecondsCoefficient(unit)
+        elapsed = start_datetime.replace(tzinfo=None) - _ALIGN_ORIGIN_DATETIME
+        elapsed_second = elapsed.days * 86400 + elapsed.seconds
+        first_boundary = start_datetime + datetime.timedelta(
+            seconds=unit_second - elapsed_second % unit_second,
+            microseconds=-elapsed.microseconds)
+
+        boundary_list = [start_datetime]
+        boundary = first_boundary
+        unit_delta = datetime.timedelta(seconds=unit_second)
+        while boundary < end_datetime:
+            boundary_list.append(boundary)
+            boundary += unit_delta
+
+    boundary_list.append(end_datetime)
+    overlap = datetime.timedelta(seconds=overlap_second)
+
+    return [
+        (max(window_start - overlap, start_datetime),
+         min(window_end + overlap, end_datetime))
+        for window_start, window_end
+        in zip(boundary_list[:-1], boundary_list[1:])
+        if window_start < window_end
+    ]
+
+
+def _call_time_range_function(arg_list):
+    function, start_datetime, end_datetime = arg_list
+
+    return function(start_datetime, end_datetime)
+
+
+def map_time_range(
+        function, time_range_list, workers=None, use_process=False,
+        merge_func=None):
+    """
+    Call function(window start, window end) for each of the windows
+    by a thread or process pool.
+
+    :param function: Function to be called for each window.
+        Should be picklable (module level function) if use_process.
+    :param list time_range_list: Windows. e.g. result of split_time_range.
+    :param int workers: Number of workers.
+        Call sequentially if |None| or less than 2.
+    :param bool use_process: Use process pool instead of thread pool.
+    :param merge_func: Merge the results by reduce(merge_func, results)
+        if specified.
+    :return: Results in order of the windows, or the merged result.
+    """
+
+    import functools
+
+    arg_list = [
+        (function, start_datetime, end_datetime)
+        for start_datetime, end_datetime in time_range_list
+    ]
+
+    if workers is None or workers < 2 or len(arg_list) < 2:
+        result_list = [_call_time_range_function(arg) for arg in arg_list]
+    else:
+        import multiprocessing
+        import multiprocessing.pool
+
+        if use_process:
+            pool = multiprocessing.Pool(min(workers, len(arg_list)))
+        else:
+            pool = multiprocessing.pool.ThreadPool(
+                min(workers, len(arg_list)))
+
+        try:
+            result_list = pool.map(_call_time_range_function, arg_list)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    if merge_func is None:
+        return result_list
+
+    return functools.reduce(merge_func, result_list)
+
+
+class DateTimeFormatter(object):
+    """
+    Fast datetime formatter for bulk output.
+    The formatted string up to seconds (and the timezone part)
+    is cached per second, so only the sub-second part is formatted
+    for the timestamps within the same second.
+
+    :param str datetime_format: strftime format without sub-second part.
+        e.g. Format.ISO.DATETIME, Format.ISO8601.Basic.DATETIME,
+        Format.ISO8601.Extended.DATETIME
+    :param int subsecond_digit: Digits of the sub-second part: 0, 3 or 6.
+        The sub-second part is inserted just after the seconds (%S).
+    """
+
+    __SUBSECOND_DIGIT_LIST = (0, 3, 6)
+
+    def __init__(
+            self, datetime_format=Format.ISO.DATETIME, subsecond_digit=0,
+            subsecond_separator="."):
+        if subsecond_digit not in self.__SUBSECOND_DIGIT_LIST:
+            raise ValueError("subsecond digit must be one of %s: %s" % (
+                str(self.__SUBSECOND_DIGIT_LIST), str(subsecond_digit)))
+
+        prefix_format, second_format, suffix_format = (
+            datetime_format.partition("%S"))
+        self.__prefix_format = prefix_format + second_format
+        self.__suffix_format = suffix_format
+        self.__subsecond_digit = subsecond_digit
+        self.__subsecond_separator = subsecond_separator
+
+        # (key, prefix, suffix): replaced at once to be thread-safe
+        self.__datetime_cache = (None, "", "")
+        self.__epoch_cache = (None, "", "")
+
+    def format_datetime(self, dt):
+        """
+        :param datetime.datetime dt: Datetime to be formatted.
+        :rtype: str
+        """
+
+        key = (
+            dt.second, dt.minute, dt.hour, dt.day, dt.month, dt.year,
+            dt.tzinfo)
+        cache_key, prefix, suffix = self.__datetime_cache
+
+        if key != cache_key:
+            prefix = dt.strftime(self.__prefix_format)
+            suffix = dt.strftime(self.__suffix_format)
+            self.__datetime_cache = (key, prefix, suffix)
+
+        return self.__join(prefix, dt.microsecond, suffix)
+
+    def format_epoch(self, epoch, utc=False):
+        """
+        :param float epoch: UNIX epoch seconds to be formatted.
+        :param bool utc: Format as UTC if |True|, local time otherwise.
+        :rtype: str
+        """
+
+        # round to the nearest microsecond as datetime.fromtimestamp does:
+        # truncation turns 0.123 into 0.122 by the float error
+        second, microsecond = divmod(int(round(epoch * 1000000)), 1000000)
+        key = (second, utc)
+        cache_key, prefix, suffix = self.__epoch_cache
+
+        if key != cache_key:
+            import time
+
+            if utc:
+                struct_time = time.gmtime(second)
+            else:
+                struct_time = time.localtime(second)
+
+            prefix = time.strftime(self.__prefix_format, struct_time)
+            suffix = time.strftime(self.__suffix_format, struct_time)
+            self.__epoch_cache = (key, prefix, suffix)
+
+        return self.__join(prefix, microsecond, suffix)
 
-    if size < 0:
-        raise ValueError("minus size")
+    def __join(self, prefix, microsecond, suffix):
+        if self.__subsecond_digit == 0:
+            return prefix + suffix
 
-    return size * getTimeUnitSecondsCoefficient(unit)
+        return "".join([
+            prefix,
+            self.__subsecond_separator,
+            ("%06d" % (microsecond))[:self.__subsecond_digit],
+            suffix,
+        ])
@@ -5,24 +5,91 @@
 '''
 
 from __future__ import with_statement
+import codecs
+import collections
+import io
+import marshal
 import os
+import re
+import stat
 import sys
+import threading
 
 try:
     import json
 except ImportError:
     import simplejson as json
 
+import six
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 import thutils.gfile as gfile
+from thutils.cache import lru_memoize
+from thutils.common import _is_fork_process
+from thutils.common import _is_picklable
+from thutils.validator import get_validator
+
+
+class JsonBackend:
+    """
+    JSON decoders. Faster third party decoders are used only if
+    installed and selected by JsonLoader.json_backend.
+    AUTO selects the first available decoder of AUTO_ORDER.
+    """
+
+    AUTO = "auto"
+    STDLIB = "json"
+    ORJSON = "orjson"
+    SIMDJSON = "simdjson"
+    UJSON = "ujson"
+
+    AUTO_ORDER = [ORJSON, SIMDJSON, UJSON, STDLIB]
 
 
 class JsonLoader:
 
+    class FileCheckMode:
+        """
+        How JsonLoader.load checks the file is JSON before parsing.
+
+        - NONE: no check.
+        - MAGIC: libmagic reports the file as a text file.
+        - SNIFF: the head of the file is JSON text: no NUL bytes unless
+          a UTF-16/32 BOM, and begins with ``{`` or ``[``.
+          Much faster than MAGIC and does not need libmagic.
+        """
+
+        NONE = "none"
+        MAGIC = "magic"
+        SNIFF = "sniff"
+
+    file_check_mode = FileCheckMode.MAGIC
+    json_backend = JsonBackend.STDLIB
+
+    #: Number of processes to validate large arrays in chunks.
+    #: See also thutils.validator.SchemaValidator.validate.
+    validation_workers = None
+
     @classmethod
-    def load(cls, json_file_path, schema=None):
+    def load(
+            cls, json_file_path, schema=None, use_cache=False,
+            file_check_mode=None, lazy_validation=False):
         """
         :param str json_file_path: Path to the JSON file to be read.
         :param voluptuous.Schema schema: JSON schema.
+            Schema definitions (e.g. dictionaries) are also accepted.
+        :param bool use_cache: If |True|, reuse the result of the previous
+            load while the file is unchanged. See also JsonLoadCache.
+        :param str file_check_mode: One of the JsonLoader.FileCheckMode.
+            Defaults to JsonLoader.file_check_mode.
+        :param bool lazy_validation: If |True|, validate values of
+            the JSON object on the first access of each key
+            (see also thutils.validator.SchemaValidator.validate_lazy).
+            Ignored if use_cache.
         :return: Dictionary storing the parse results of JSON.
         :rtype: dictionary
 
@@ -33,24 +100,49 @@ class JsonLoader:
         :raises ValueError:
         """
 
-        gfile.check_file_existence(json_file_path)
+        if use_cache:
+            return JsonLoadCache.load(
+                json_file_path, schema,
+                lambda file_path: cls.load(
+                    file_path, file_check_mode=file_check_mode))
 
-        try:
-            if not gfile.FileTypeChecker.is_text_file(json_file_path):
-                raise ValueError("not a JSON file")
-        except ImportError:
-            # magicが必要とするライブラリが見つからない (e.g. Windowsでは追加DLLが必要)
-            raise
+        if file_check_mode is None:
+            file_check_mode = cls.file_check_mode
+
+        _check_json_file(json_file_path)
 
-        with open(json_file_path, "r") as fp:
+        if file_check_mode == cls.FileCheckMode.MAGIC and (
+                get_compression(json_file_path) is not None):
+            # libmagic can not see the content of compressed files
+            file_check_mode = cls.FileCheckMode.SNIFF
+
+        encoding = None
+        if file_check_mode == cls.FileCheckMode.MAGIC:
             try:
-                dict_json = json.load(fp)
-            except ValueError:
-                _, e, _ = sys.exc_info()  # for python 2.5 compatibility
-                raise ValueError(os.linesep.join([
-                    str(e),
-                    "decode error: check JSON format with http://jsonlint.com/",
-                ]))
+                if not gfile.FileTypeChecker.is_text_file(json_file_path):
+                    raise ValueError("not a JSON file")
+            except ImportError:
+                # magicが必要とするライブラリが見つからない (e.g. Windowsでは追加DLLが必要)
+                raise
+        elif file_check_mode == cls.FileCheckMode.SNIFF:
+            encoding = _sniff_json_encoding(json_file_path)
+            if encoding is None:
+                raise ValueError("not a JSON file")
+        elif file_check_mode != cls.FileCheckMode.NONE:
+            raise ValueError("unknown file check mode: " + file_check_mode)
+
+        json_buffer = _read_file_buffer(json_file_path)
+        if encoding not in [None, "utf-8"]:
+            json_buffer = bytes(json_buffer).decode(encoding)
+
+        try:
+            dict_json = get_json_decoder(cls.json_backend)(json_buffer)
+        except ValueError:
+            _, e, _ = sys.exc_info()  # for python 2.5 compatibility
+            raise _make_decode_error(e)
+
+        if lazy_validation and schema is not None:
+            return get_validator(schema).validate_lazy(dict_json)
 
         cls.__validate_json(schema, dict_json)
 
@@ -59,7 +151,9 @@ class JsonLoader:
     @classmethod
     def loads(cls, json_text, schema=None):
         """
-        :param str json_text: json text to be parse
+        :param json_text: json text to be parse.
+            bytes are decoded as UTF-8 by the JSON decoder.
+        :type json_text: str or bytes
         :param voluptuous.Schema schema: JSON schema.
         :return: Dictionary storing the parse results of JSON
         :rtype: dictionary
@@ -69,24 +163,1465 @@ class JsonLoader:
         """
 
         try:
-            json_text = json_text.decode("ascii")
-        except AttributeError:
-            pass
-
-        try:
-            dict_json = json.loads(json_text)
+            dict_json = get_json_decoder(cls.json_backend)(json_text)
         except ValueError:
             _, e, _ = sys.exc_info()  # for python 2.5 compatibility
-            raise ValueError(os.linesep.join([
-                str(e),
-                "decode error: check JSON format with http://jsonlint.com/",
-            ]))
+            raise _make_decode_error(e)
 
         cls.__validate_json(schema, dict_json)
 
         return dict_json
 
+    @classmethod
+    def load_many(
+            cls, json_file_path_list, schema=None, workers=None,
+            use_process=False, use_cache=False, file_check_mode=None):
+        """
+        Load JSON files by a thread or process pool.
+        Errors are collected per file instead of aborting the loading.
+
+        :param list json_file_path_list: Paths to the JSON files.
+        :param voluptuous.Schema schema: JSON schema of each file.
+        :param int workers: Number of workers.
+            Load sequentially if |None| or less than 2.
+        :param bool use_process: Use process pool instead of thread pool.
+            Thread pool is enough to overlap I/O waits, process pool also
+            parallelizes parsing.
+        :param bool use_cache: Same as load.
+        :param str file_check_mode: Same as load.
+        :return: Pair of dictionaries:
+            path to the loaded result of the file, and
+            path to the exception raised by loading the file.
+        :rtype: tuple
+        """
+
+        path_list = list(collections.OrderedDict.fromkeys(
+            json_file_path_list))
+        load_option = (use_cache, file_check_mode)
+
+        if workers is None or workers < 2 or len(path_list) < 2:
+            result_iter = (
+                _load_json_file(path, schema, load_option)
+                for path in path_list
+            )
+            return _collect_load_result(result_iter)
+
+        import multiprocessing
+        import multiprocessing.pool
+
+        worker_count = min(workers, len(path_list))
+
+        if not use_process:
+            pool = multiprocessing.pool.ThreadPool(worker_count)
+            try:
+                return _collect_load_result(pool.imap(
+                    lambda path: _load_json_file(path, schema, load_option),
+                    path_list))
+            finally:
+                pool.terminate()
+                pool.join()
+
+        is_worker_validation, worker_schema = _get_worker_schema(schema)
+
+        pool = multiprocessing.Pool(
+            worker_count,
+            initializer=_initialize_load_many_worker,
+            initargs=(worker_schema, load_option, cls.json_backend))
+        try:
+            result_iter = pool.imap(_load_json_file_worker, path_list)
+            if not is_worker_validation:
+                result_iter = (
+                    _validate_load_result(result, schema)
+                    for result in result_iter
+                )
+
+            return _collect_load_result(result_iter)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    @classmethod
+    def iter_items(cls, json_file_path, schema=None, item_path=None):
+        """
+        Incrementally parse a JSON array in the file and yield
+        the elements one at a time, so memory usage does not depend on
+        the file size.
+
+        :param str json_file_path: Path to the JSON file to be read.
+        :param voluptuous.Schema schema: JSON schema of an element.
+        :param list item_path: Path to a nested array: object keys and/or
+            array indices. e.g. ["data", "records"]
+            Iterate the top-level array if |None|.
+        :raises InvalidFilePathError:
+        :raises FileNotFoundError:
+        :raises KeyError: item_path not found.
+        :raises ValueError:
+        """
+
+        _check_json_file(json_file_path)
+
+        with _open_text(json_file_path) as fp:
+            reader = _JsonStreamReader(
+                fp, get_json_decoder(cls.json_backend))
+
+            if item_path:
+                reader.find_path(item_path)
+
+            for _ in reader.iter_array():
+                item = reader.decode_value()
+                cls.__validate_json(schema, item)
+
+                yield item
+
+    @classmethod
+    def load_paths(cls, json_file_path, path_list):
+        """
+        Extract only the subtrees at the paths from a JSON file.
+        Other values are skipped by the tokenizer without being decoded,
+        and the reading stops when all of the paths are found.
+
+        :param str json_file_path: Path to the JSON file to be read.
+        :param list path_list: JSON Pointers (RFC 6901. e.g. "/data/0/id")
+            and/or sequences of object keys and array indices
+            (e.g. ("data", 0, "id")).
+        :return: Dictionary of path to the subtree.
+            Paths not found in the document are not included.
+            Sequence paths are converted to tuples.
+        :rtype: dict
+        :raises InvalidFilePathError:
+        :raises FileNotFoundError:
+        :raises ValueError:
+        """
+
+        _check_json_file(json_file_path)
+
+        path_table = {}
+        for path in path_list:
+            if isinstance(path, six.string_types):
+                path_table[path] = _parse_json_pointer(path)
+            else:
+                path = tuple(path)
+                path_table[path] = [six.text_type(token) for token in path]
+
+        root_node = _JsonPathNode()
+        for path, token_list in path_table.items():
+            root_node.add_path(token_list, path)
+
+        result = {}
+        if root_node.path_count == 0:
+            return result
+
+        with _open_text(json_file_path) as fp:
+            root_node.extract(
+                _JsonStreamReader(fp, get_json_decoder(cls.json_backend)),
+                result, root_node.path_count)
+
+        return result
+
+    @classmethod
+    def load_columns(
+            cls, json_file_path, column_type_table=None, schema=None,
+            item_path=None):
+        """
+        Load a JSON array of records (objects) into columnar storage:
+        int/float/bool columns are stored in typed arrays and
+        string columns hold interned strings, instead of a dictionary
+        per record. Records are parsed by iter_items, so the list of
+        the dictionaries is never materialized.
+
+        :param str json_file_path: Path to the JSON file to be read.
+        :param dict column_type_table: Column name to the type of the
+            column: int, float, bool, str (six.text_type) or object.
+            Only these columns are loaded, and values not matching
+            the types raise ValueError.
+            If |None|, load all of the columns and infer the types:
+            int columns with float values become float, other columns
+            with mixed types (including null and missing values)
+            become object.
+        :param voluptuous.Schema schema: JSON schema of a record.
+        :param list item_path: Same as iter_items.
+        :rtype: JsonColumnTable
+        :raises InvalidFilePathError:
+        :raises FileNotFoundError:
+        :raises KeyError: item_path not found.
+        :raises ValueError:
+        """
+
+        return _build_column_table(
+            cls.iter_items(json_file_path, schema, item_path),
+            column_type_table)
+
+    @classmethod
+    def __validate_json(cls, schema, dict_json):
+        if schema is not None:
+            get_validator(schema).validate(
+                dict_json, cls.validation_workers)
+
+
+class JsonLinesLoader:
+    """
+    Loader of JSON Lines (newline-delimited JSON) files.
+    With workers, the file is split into byte ranges aligned on newlines
+    and the ranges are parsed by a process pool.
+    """
+
+    @classmethod
+    def load(cls, jsonl_file_path, schema=None, workers=None):
+        """
+        :param str jsonl_file_path: Path to the JSON Lines file to be read.
+        :param voluptuous.Schema schema: JSON schema of a record.
+        :param int workers: Number of worker processes.
+            Parse in the current process if |None| or less than 2.
+        :return: Records in order of the lines.
+        :rtype: list
+        :raises InvalidFilePathError:
+        :raises FileNotFoundError:
+        :raises ValueError:
+        """
+
+        return list(cls.iter_items(jsonl_file_path, schema, workers))
+
+    @classmethod
+    def iter_items(cls, jsonl_file_path, schema=None, workers=None):
+        """
+        Same as load, except for yielding records in order of the lines.
+        """
+
+        _check_json_file(jsonl_file_path)
+
+        # compressed files can not be split into byte ranges
+        if workers is None or workers < 2 or (
+                get_compression(jsonl_file_path) is not None):
+            with _open_binary(jsonl_file_path) as fp:
+                for record in _parse_json_lines(
+                        fp, 0, schema, JsonLoader.json_backend):
+                    yield record
+
+            return
+
+        for record in cls.__iter_items_parallel(
+                jsonl_file_path, schema, workers):
+            yield record
+
+    @classmethod
+    def __iter_items_parallel(cls, jsonl_file_path, schema, workers):
+        import multiprocessing
+        from thutils.logscan import _imap_bounded
+        from thutils.logscan import _split_worker_range
+
+        arg_list = _split_worker_range(jsonl_file_path, workers)
+        if not arg_list:
+            return
+
+        is_worker_validation, worker_schema = _get_worker_schema(schema)
+        if not is_worker_validation:
+            validate = get_validator(schema).validate
+
+        pool = multiprocessing.Pool(
+            min(workers, len(arg_list)),
+            initializer=_initialize_json_lines_worker,
+            initargs=(
+                jsonl_file_path, worker_schema, JsonLoader.json_backend))
+        try:
+            for record_list in _imap_bounded(
+                    pool, _parse_json_lines_chunk, arg_list, workers):
+                for record in record_list:
+                    if not is_worker_validation:
+                        validate(record)
+
+                    yield record
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+class JsonLoadCache:
+    """
+    Cache of the JsonLoader.load results.
+    A result is reused while the (path, inode, size, mtime_ns) of
+    the file is unchanged, and the schema validation is skipped for
+    the schemas (compared by identity) that the result already passed.
+
+    Results are held as marshal serialized data, so modifications of
+    the returned dictionaries do not affect the cache.
+    The in-process tier holds up to ``maxsize`` files.
+    The on-disk tier is enabled by setting ``cache_dir_path``:
+    results are written to the directory and shared across processes.
+    """
+
+    __CACHE_FILE_EXTENSION = ".marshal"
+
+    maxsize = 128
+    cache_dir_path = None
+
+    __lock = threading.Lock()
+    __entry_table = collections.OrderedDict()
+
+    @classmethod
+    def clear(cls):
+        """
+        Discard the cached results of the both tiers.
+        """
+
+        with cls.__lock:
+            cls.__entry_table.clear()
+
+        if cls.cache_dir_path is None or not os.path.isdir(
+                cls.cache_dir_path):
+            return
+
+        for file_name in os.listdir(cls.cache_dir_path):
+            if not file_name.endswith(cls.__CACHE_FILE_EXTENSION):
+                continue
+
+            try:
+                os.remove(os.path.join(cls.cache_dir_path, file_name))
+            except (IOError, OSError):
+                pass
+
+    @classmethod
+    def load(cls, json_file_path, schema=None, load_func=None):
+        """
+        :param str json_file_path: Path to the JSON file to be read.
+        :param voluptuous.Schema schema: JSON schema.
+        :param load_func: Function to parse the file when the cache missed.
+            Defaults to JsonLoader.load.
+        :return: Dictionary storing the parse results of JSON.
+        :rtype: dictionary
+        :raises: Same exceptions as load_func.
+        """
+
+        if load_func is None:
+            load_func = JsonLoader.load
+
+        file_path = os.path.abspath(json_file_path)
+        stat_key = _make_stat_key(file_path)
+        if stat_key is None:
+            # not a regular file: load_func raises the proper exception
+            dict_json = load_func(json_file_path)
+            if schema is not None:
+                get_validator(schema).validate(
+                    dict_json, JsonLoader.validation_workers)
+
+            return dict_json
+
+        entry = cls.__get_entry(file_path, stat_key)
+        if entry is None:
+            dict_json = load_func(json_file_path)
+            entry = _JsonLoadCacheEntry(stat_key, marshal.dumps(dict_json))
+
+            # the file modified while loading is not cached
+            if _make_stat_key(file_path) == stat_key:
+                cls.__put_entry(file_path, entry)
+                cls.__write_entry(file_path, entry)
+        else:
+            dict_json = marshal.loads(entry.blob)
+
+        if schema is not None and not entry.is_validated(schema):
+            get_validator(schema).validate(
+                dict_json, JsonLoader.validation_workers)
+            entry.add_validated_schema(schema)
+
+        return dict_json
+
+    @classmethod
+    def __get_entry(cls, file_path, stat_key):
+        with cls.__lock:
+            entry = cls.__entry_table.pop(file_path, None)
+            if entry is not None and entry.stat_key == stat_key:
+                cls.__entry_table[file_path] = entry
+                return entry
+
+        entry = cls.__read_entry(file_path)
+        if entry is None or entry.stat_key != stat_key:
+            return None
+
+        cls.__put_entry(file_path, entry)
+
+        return entry
+
+    @classmethod
+    def __put_entry(cls, file_path, entry):
+        with cls.__lock:
+            cls.__entry_table.pop(file_path, None)
+            cls.__entry_table[file_path] = entry
+
+            while len(cls.__entry_table) > max(cls.maxsize, 0):
+                cls.__entry_table.popitem(last=False)
+
+    @classmethod
+    def __get_cache_file_path(cls, file_path):
+        import hashlib
+
+        if cls.cache_dir_path is None:
+            return None
+
+        # marshal format depends on the python version
+        return os.path.join(cls.cache_dir_path, "%s_py%d%d%s" % (
+            hashlib.sha1(file_path.encode("utf-8")).hexdigest(),
+            sys.version_info[0], sys.version_info[1],
+            cls.__CACHE_FILE_EXTENSION))
+
+    @classmethod
+    def __read_entry(cls, file_path):
+        cache_file_path = cls.__get_cache_file_path(file_path)
+        if cache_file_path is None:
+            return None
+
+        try:
+            with open(cache_file_path, "rb") as fp:
+                stat_key, blob = marshal.load(fp)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+
+        return _JsonLoadCacheEntry(tuple(stat_key), blob)
+
+    @classmethod
+    def __write_entry(cls, file_path, entry):
+        import tempfile
+
+        cache_file_path = cls.__get_cache_file_path(file_path)
+        if cache_file_path is None:
+            return
+
+        # write to a temporary file and rename it, so that other processes
+        # never read a partially written cache file
+        try:
+            gfile.FileManager.make_directory(cls.cache_dir_path, force=True)
+            fd, temp_file_path = tempfile.mkstemp(
+                suffix=".tmp", dir=cls.cache_dir_path)
+            with os.fdopen(fd, "wb") as fp:
+                marshal.dump((entry.stat_key, entry.blob), fp)
+            _replace_file(temp_file_path, cache_file_path)
+        except (IOError, OSError):
+            # the on-disk tier is only a cache
+            pass
+
+
+class _JsonLoadCacheEntry(object):
+
+    def __init__(self, stat_key, blob):
+        self.stat_key = stat_key
+        self.blob = blob
+        self.__validated_schema_list = []
+
+    def is_validated(self, schema):
+        return any([
+            validated_schema is schema
+            for validated_schema in self.__validated_schema_list
+        ])
+
+    def add_validated_schema(self, schema):
+        # keep references to the schemas, so that the identities are
+        # not reused by other objects
+        self.__validated_schema_list.append(schema)
+
+
+def _check_json_file(file_path):
+    """
+    :raises InvalidFilePathError:
+    :raises FileNotFoundError:
+    :raises ValueError: If the path is not a file.
+    """
+
+    if gfile.check_file_existence(file_path) != gfile.FileType.FILE:
+        raise ValueError("not a JSON file")
+
+
+def _make_stat_key(file_path):
+    """
+    :return: |None| if the path is not a regular file.
+    :rtype: tuple
+    """
+
+    stat_key = gfile._get_stat_key(file_path, follow_symlinks=True)
+    if stat_key is None or stat_key[-1] != stat.S_IFREG:
+        return None
+
+    # the path guards the disk cache against hash collisions of names
+    return (file_path,) + stat_key
+
+
+def _replace_file(src_path, dst_path):
+    try:
+        os.replace(src_path, dst_path)
+    except AttributeError:
+        # python 2 does not have os.replace
+        if os.name == "nt" and os.path.exists(dst_path):
+            os.remove(dst_path)
+        os.rename(src_path, dst_path)
+
+
+def _to_decodable(json_buffer):
+    if isinstance(json_buffer, bytearray):
+        return bytes(json_buffer)
+
+    return json_buffer
+
+
+def _make_stdlib_decoder():
+    if sys.version_info >= (3, 6):
+        return json.loads
+
+    def decode(json_buffer):
+        json_buffer = _to_decodable(json_buffer)
+        if six.PY3 and isinstance(json_buffer, bytes):
+            # json.loads accepts bytes since python 3.6
+            json_buffer = json_buffer.decode("utf-8")
+
+        return json.loads(json_buffer)
+
+    return decode
+
+
+def _make_json_decoder(json_backend):
+    if json_backend == JsonBackend.STDLIB:
+        return _make_stdlib_decoder()
+
+    if json_backend == JsonBackend.ORJSON:
+        import orjson
+
+        return orjson.loads
+
+    if json_backend == JsonBackend.SIMDJSON:
+        import simdjson
+
+        return lambda json_buffer: simdjson.loads(_to_decodable(json_buffer))
+
+    if json_backend == JsonBackend.UJSON:
+        import ujson
+
+        return lambda json_buffer: ujson.loads(_to_decodable(json_buffer))
+
+    raise ValueError("unknown JSON backend: %s" % (json_backend))
+
+
+@lru_memoize(maxsize=8)
+def _resolve_json_backend(json_backend):
+    if json_backend != JsonBackend.AUTO:
+        return (json_backend, _make_json_decoder(json_backend))
+
+    for backend in JsonBackend.AUTO_ORDER:
+        try:
+            return (backend, _make_json_decoder(backend))
+        except ImportError:
+            continue
+
+    raise ImportError("JSON decoder not found")
+
+
+def resolve_json_backend(json_backend):
+    """
+    :param str json_backend: One of the JsonBackend.
+    :return: Name of the backend actually used for json_backend.
+    :rtype: str
+    :raises ImportError: the backend is not installed.
+    :raises ValueError: unknown backend.
+    """
+
+    return _resolve_json_backend(json_backend)[0]
+
+
+def get_json_decoder(json_backend):
+    """
+    Backends are resolved only once, and then the decoders are reused.
+
+    :param str json_backend: One of the JsonBackend.
+    :return: Function that decodes JSON text given as
+        str or bytes-like object (UTF-8).
+    :raises ImportError: the backend is not installed.
+    :raises ValueError: unknown backend.
+    """
+
+    return _resolve_json_backend(json_backend)[1]
+
+
+class Compression:
+    GZIP = "gzip"
+    BZIP2 = "bzip2"
+    XZ = "xz"
+
+
+_COMPRESSION_SIGNATURE_LIST = [
+    (six.b("\x1f\x8b"), Compression.GZIP),
+    (six.b("BZh"), Compression.BZIP2),
+    (six.b("\xfd7zXZ\x00"), Compression.XZ),
+]
+_COMPRESSION_SIGNATURE_SIZE = 6
+
+
+def _detect_compression(fp):
+    head = fp.read(_COMPRESSION_SIGNATURE_SIZE)
+    fp.seek(0)
+
+    for signature, compression in _COMPRESSION_SIGNATURE_LIST:
+        if head.startswith(signature):
+            return compression
+
+    return None
+
+
+def get_compression(file_path):
+    """
+    Detect compression of the file by the signature bytes
+    (not by the extension, which may not match the content).
+
+    :return: One of the Compression. |None| if not compressed.
+    :rtype: str
+    """
+
+    with io.open(file_path, "rb") as fp:
+        return _detect_compression(fp)
+
+
+def _open_decompressor(file_path, compression):
+    if compression == Compression.GZIP:
+        import gzip
+
+        return gzip.GzipFile(file_path, "rb")
+
+    if compression == Compression.BZIP2:
+        import bz2
+
+        return bz2.BZ2File(file_path, "rb")
+
+    if compression == Compression.XZ:
+        import lzma
+
+        return lzma.LZMAFile(file_path, "rb")
+
+    raise ValueError("unknown compression: %s" % (compression))
+
+
+def _open_binary(file_path):
+    """
+    Open the file for reading bytes.
+    Compressed files are decompressed on the fly.
+    """
+
+    fp = io.open(file_path, "rb")
+    try:
+        compression = _detect_compression(fp)
+    except Exception:
+        fp.close()
+        raise
+
+    if compression is None:
+        return fp
+
+    fp.close()
+
+    return _open_decompressor(file_path, compression)
+
+
+def _open_text(file_path):
+    return io.TextIOWrapper(_open_binary(file_path), encoding="utf-8")
+
+
+def _read_file_buffer(file_path):
+    """
+    Read the whole file by a single readinto to a buffer
+    pre-sized by the file size.
+    Compressed files are decompressed in memory.
+
+    :rtype: bytearray or bytes
+    """
+
+    with io.open(file_path, "rb") as fp:
+        compression = _detect_compression(fp)
+        if compression is not None:
+            with _open_decompressor(file_path, compression) as dfp:
+                return dfp.read()
+
+        file_size = os.fstat(fp.fileno()).st_size
+        json_buffer = bytearray(file_size)
+        read_size = fp.readinto(json_buffer)
+
+        # the file may be changed after fstat
+        # (or the size is unknown, e.g. files of procfs)
+        remain = fp.read()
+
+    if read_size < file_size:
+        del json_buffer[read_size:]
+    if remain:
+        json_buffer.extend(remain)
+
+    return json_buffer
+
+
+_SNIFF_SIZE = 4096
+_BOM_ENCODING_LIST = [
+    # UTF-32 BOMs first: BOM_UTF32_LE begins with BOM_UTF16_LE
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+_JSON_HEAD_CHAR_LIST = [six.b("{"), six.b("[")]
+
+
+def _sniff_json_encoding(file_path):
+    """
+    Check the head of the file looks like JSON text.
+
+    :return: Encoding of the file. |None| if the file is not JSON.
+    :rtype: str
+    """
+
+    with _open_binary(file_path) as fp:
+        head = fp.read(_SNIFF_SIZE)
+
+    for bom, encoding in _BOM_ENCODING_LIST:
+        if not head.startswith(bom):
+            continue
+
+        text = head.decode(encoding, "ignore").lstrip()
+        if text[:1] not in [six.u("{"), six.u("[")]:
+            return None
+
+        return encoding
+
+    if six.b("\0") in head:
+        return None
+
+    if head.lstrip()[:1] not in _JSON_HEAD_CHAR_LIST:
+        return None
+
+    return "utf-8"
+
+
+class JsonColumnTable(object):
+    """
+    Records stored column by column. See also JsonLoader.load_columns.
+    Rows are accessed by lightweight read-only views (JsonRowView).
+    """
+
+    @property
+    def column_name_list(self):
+        return list(self.__column_table)
+
+    @property
+    def column_type_table(self):
+        return collections.OrderedDict([
+            (column_name, column.column_type)
+            for column_name, column in self.__column_table.items()
+        ])
+
+    def __init__(self, column_table, row_count):
+        self.__column_table = column_table
+        self.__row_count = row_count
+
+    def __len__(self):
+        return self.__row_count
+
+    def __getitem__(self, row_index):
+        if row_index < 0:
+            row_index += self.__row_count
+        if not 0 <= row_index < self.__row_count:
+            raise IndexError("row index out of range")
+
+        return JsonRowView(self, row_index)
+
+    def __iter__(self):
+        for row_index in range(self.__row_count):
+            yield JsonRowView(self, row_index)
+
+    def get_column(self, column_name):
+        """
+        :return: Values of the column.
+            array.array for int/float/bool (stored as 0/1) columns,
+            list for the others.
+        :raises KeyError:
+        """
+
+        return self.__column_table[column_name].values
+
+    def get_value(self, row_index, column_name):
+        """
+        :raises KeyError:
+        :raises IndexError:
+        """
+
+        return self.__column_table[column_name].get_value(row_index)
+
+    def to_numpy(self, column_name):
+        """
+        :return: numpy.ndarray of the column. Arrays of int/float/bool
+            columns share the memory with the table (no copy).
+        :raises ImportError: numpy not installed.
+        :raises KeyError:
+        """
+
+        import numpy
+
+        column = self.__column_table[column_name]
+
+        if column.column_type is bool:
+            return numpy.frombuffer(column.values, dtype=numpy.bool_)
+
+        if column.column_type in (int, float):
+            return numpy.frombuffer(
+                column.values, dtype=numpy.dtype(column.values.typecode))
+
+        column_array = numpy.empty(len(column.values), dtype=object)
+        column_array[:] = column.values
+
+        return column_array
+
+
+class JsonRowView(Mapping):
+    """
+    Read-only dictionary view of a row of JsonColumnTable.
+    """
+
+    __slots__ = ("__table", "__row_index")
+
+    def __init__(self, table, row_index):
+        self.__table = table
+        self.__row_index = row_index
+
+    def __getitem__(self, column_name):
+        return self.__table.get_value(self.__row_index, column_name)
+
+    def __iter__(self):
+        return iter(self.__table.column_name_list)
+
+    def __len__(self):
+        return len(self.__table.column_name_list)
+
+    def __repr__(self):
+        return "JsonRowView(%s)" % (repr(dict(self)))
+
+
+def _get_int_typecode():
+    import array
+
+    try:
+        array.array("q")
+    except ValueError:
+        # "q" is not available before python 3.3
+        return "l"
+
+    return "q"
+
+
+_COLUMN_TYPECODE_TABLE = {
+    bool: "b",
+    int: _get_int_typecode(),
+    float: "d",
+}
+
+
+def _get_column_type(value):
+    if isinstance(value, bool):
+        return bool
+    if isinstance(value, six.integer_types):
+        return int
+    if isinstance(value, float):
+        return float
+    if isinstance(value, six.string_types):
+        return six.text_type
+
+    return object
+
+
+def _intern(value):
+    if not isinstance(value, str):
+        # unicode strings can not be interned by python 2
+        return value
+
+    try:
+        return sys.intern(value)
+    except AttributeError:
+        return intern(value)
+
+
+class _ColumnBuilder(object):
+
+    def __init__(self, column_name, column_type, is_fixed_type, row_count=0):
+        if column_type is str:
+            column_type = six.text_type
+        if column_type not in [
+                bool, int, float, six.text_type, object]:
+            raise ValueError("invalid column type: column=%s, type=%s" % (
+                column_name, column_type))
+
+        self.column_name = column_name
+        self.column_type = column_type
+        self.values = self.__make_values(column_type)
+        self.__is_fixed_type = is_fixed_type
+
+        if row_count > 0:
+            self.values.extend([None] * row_count)
+
+    def get_value(self, row_index):
+        value = self.values[row_index]
+
+        if self.column_type is bool:
+            return bool(value)
+
+        return value
+
+    def append(self, value, row_index):
+        value_type = _get_column_type(value)
+
+        if value_type is not self.column_type:
+            self.__change_type(value, value_type, row_index)
+
+        if self.column_type is six.text_type:
+            value = _intern(value)
+
+        try:
+            self.values.append(value)
+        except OverflowError:
+            # out of the range of the typed array
+            self.__change_type(value, object, row_index)
+            self.values.append(value)
+
+    def __change_type(self, value, value_type, row_index):
+        if self.column_type is object:
+            return
+
+        if self.column_type is float and value_type is int:
+            return
+
+        if self.__is_fixed_type:
+            raise ValueError(
+                "invalid value type: column=%s, row=%d, expected=%s, "
+                "value=%s" % (
+                    self.column_name, row_index, self.column_type.__name__,
+                    repr(value)))
+
+        if set([self.column_type, value_type]) == set([int, float]):
+            new_type = float
+        else:
+            new_type = object
+
+        new_values = self.__make_values(new_type)
+        new_values.extend([
+            self.get_value(i) for i in range(len(self.values))])
+
+        self.column_type = new_type
+        self.values = new_values
+
     @staticmethod
-    def __validate_json(schema, dict_json):
+    def __make_values(column_type):
+        import array
+
+        typecode = _COLUMN_TYPECODE_TABLE.get(column_type)
+        if typecode is None:
+            return []
+
+        return array.array(typecode)
+
+
+def _build_column_table(record_iter, column_type_table):
+    column_table = collections.OrderedDict()
+    is_fixed_type = column_type_table is not None
+
+    if is_fixed_type:
+        for column_name, column_type in column_type_table.items():
+            column_table[column_name] = _ColumnBuilder(
+                column_name, column_type, True)
+
+    row_count = 0
+
+    for record in record_iter:
+        if not isinstance(record, dict):
+            raise ValueError(
+                "record must be a JSON object: row=%d, value=%s" % (
+                    row_count, repr(record)))
+
+        if is_fixed_type:
+            for column_name, column in column_table.items():
+                column.append(record.get(column_name), row_count)
+        else:
+            for column_name, value in record.items():
+                column = column_table.get(column_name)
+                if column is None:
+                    # values of the preceding rows are missing
+                    column = _ColumnBuilder(
+                        column_name,
+                        _get_column_type(value) if row_count == 0 else object,
+                        False, row_count)
+                    column_table[column_name] = column
+
+                column.append(value, row_count)
+
+            if len(record) < len(column_table):
+                for column in column_table.values():
+                    if len(column.values) == row_count:
+                        column.append(None, row_count)
+
+        row_count += 1
+
+    return JsonColumnTable(column_table, row_count)
+
+
+def _load_json_file(json_file_path, schema, load_option):
+    """
+    :return: (path, loaded result, exception)
+    """
+
+    use_cache, file_check_mode = load_option
+
+    try:
+        return (
+            json_file_path,
+            JsonLoader.load(
+                json_file_path, schema, use_cache, file_check_mode),
+            None)
+    except Exception:
+        _, e, _ = sys.exc_info()  # for python 2.5 compatibility
+        return (json_file_path, None, e)
+
+
+_load_many_worker_arg_list = None
+
+
+def _initialize_load_many_worker(schema, load_option, json_backend):
+    global _load_many_worker_arg_list
+
+    JsonLoader.json_backend = json_backend
+    _load_many_worker_arg_list = (schema, load_option)
+
+
+def _load_json_file_worker(json_file_path):
+    schema, load_option = _load_many_worker_arg_list
+    result = _load_json_file(json_file_path, schema, load_option)
+
+    json_file_path, dict_json, e = result
+    if e is not None and not _is_picklable(e):
+        # unpicklable exceptions can not be sent to the parent process
+        return (json_file_path, None, RuntimeError(repr(e)))
+
+    return result
+
+
+def _validate_load_result(result, schema):
+    json_file_path, dict_json, e = result
+    if e is not None:
+        return result
+
+    try:
+        get_validator(schema).validate(dict_json)
+    except Exception:
+        _, e, _ = sys.exc_info()  # for python 2.5 compatibility
+        return (json_file_path, None, e)
+
+    return result
+
+
+def _get_worker_schema(schema):
+    """
+    Schemas including closures can not be pickled: validate them in
+    the current process unless worker processes inherit them by fork.
+
+    :return: (whether workers validate, schema to be passed to workers)
+    :rtype: tuple
+    """
+
+    if schema is None or _is_fork_process() or _is_picklable(schema):
+        return (True, schema)
+
+    return (False, None)
+
+
+def _collect_load_result(result_iter):
+    result_table = {}
+    error_table = {}
+
+    for json_file_path, dict_json, e in result_iter:
+        if e is None:
+            result_table[json_file_path] = dict_json
+        else:
+            error_table[json_file_path] = e
+
+    return (result_table, error_table)
+
+
+_json_lines_worker_arg_list = None
+
+
+def _initialize_json_lines_worker(jsonl_file_path, schema, json_backend):
+    global _json_lines_worker_arg_list
+
+    _json_lines_worker_arg_list = (jsonl_file_path, schema, json_backend)
+
+
+def _parse_json_lines(line_iter, start_offset, schema, json_backend):
+    decode_func = get_json_decoder(json_backend)
+    if schema is not None:
+        validate = get_validator(schema).validate
+    offset = start_offset
+
+    for line in line_iter:
+        line_offset = offset
+        offset += len(line)
+
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            record = decode_func(line)
+        except ValueError:
+            _, e, _ = sys.exc_info()  # for python 2.5 compatibility
+            raise _make_decode_error(
+                "%s (line at offset %d)" % (str(e), line_offset))
+
         if schema is not None:
-            schema(dict_json)
+            validate(record)
+
+        yield record
+
+
+def _parse_json_lines_chunk(offset_range):
+    jsonl_file_path, schema, json_backend = _json_lines_worker_arg_list
+    start_offset, end_offset = offset_range
+
+    with open(jsonl_file_path, "rb") as fp:
+        fp.seek(start_offset)
+        chunk = fp.read(end_offset - start_offset)
+
+    return list(_parse_json_lines(
+        chunk.splitlines(True), start_offset, schema, json_backend))
+
+
+def _make_decode_error(e):
+    return ValueError(os.linesep.join([
+        str(e),
+        "decode error: check JSON format with http://jsonlint.com/",
+    ]))
+
+
+def _parse_json_pointer(json_pointer):
+    if json_pointer == "":
+        return []
+
+    if not json_pointer.startswith("/"):
+        raise ValueError("invalid JSON pointer: " + json_pointer)
+
+    return [
+        token.replace("~1", "/").replace("~0", "~")
+        for token in json_pointer[1:].split("/")
+    ]
+
+
+class _JsonPathNode(object):
+    """
+    Trie node of path tokens for selective extraction.
+    """
+
+    def __init__(self):
+        self.path_list = []
+        self.child_table = {}
+        self.path_count = 0
+
+    def add_path(self, token_list, path):
+        node = self
+        node.path_count += 1
+        for token in token_list:
+            node = node.child_table.setdefault(token, _JsonPathNode())
+            node.path_count += 1
+
+        node.path_list.append(path)
+
+    def extract(self, reader, result, total_count):
+        """
+        Extract values of the paths from the value at
+        the current position of the reader.
+
+        :return: |True| if all of the total_count paths are found.
+            The reader is left in the middle of the document in that case.
+        """
+
+        if self.path_list:
+            self.__extract_decoded(reader.decode_value(), result)
+            return len(result) >= total_count
+
+        char = reader.peek()
+        if char == "{":
+            member_iter = reader.iter_object()
+        elif char == "[":
+            member_iter = (
+                six.text_type(index)
+                for index, _ in enumerate(reader.iter_array()))
+        else:
+            reader.skip_value()
+            return False
+
+        for token in member_iter:
+            child_node = self.child_table.get(token)
+            if child_node is None:
+                reader.skip_value()
+                continue
+
+            if child_node.extract(reader, result, total_count):
+                return True
+
+        return False
+
+    def __extract_decoded(self, value, result):
+        for path in self.path_list:
+            result[path] = value
+
+        for token, child_node in self.child_table.items():
+            if isinstance(value, dict):
+                if token not in value:
+                    continue
+                child_node.__extract_decoded(value[token], result)
+            elif isinstance(value, list):
+                try:
+                    index = int(token)
+                except ValueError:
+                    continue
+                if not 0 <= index < len(value):
+                    continue
+                child_node.__extract_decoded(value[index], result)
+
+
+class _JsonStreamReader(object):
+    """
+    Incremental JSON tokenizer over a text file object.
+    Only the values those requested by decode_value are materialized.
+    """
+
+    __CHUNK_SIZE = 256 * 1024
+
+    __re_whitespace = re.compile("[ \t\n\r]*")
+    # text up to the next bracket, skipping complete strings
+    __re_container_body = re.compile(
+        '[^"\\[\\]{}]*'
+        '(?:"[^"\\\\]*(?:\\\\.[^"\\\\]*)*"[^"\\[\\]{}]*)*',
+        re.DOTALL)
+    __re_string_body = re.compile(
+        '[^"\\\\]*(?:\\\\.[^"\\\\]*)*', re.DOTALL)
+    __re_scalar = re.compile("[^ \t\n\r,:\\]}]*")
+
+    def __init__(self, fp, decode_func=None):
+        if decode_func is None:
+            decode_func = json.loads
+
+        self.__fp = fp
+        self.__decode_func = decode_func
+        self.__buf = ""
+        self.__pos = 0
+        self.__eof = False
+        self.__text_list = None
+        self.__text_start = 0
+
+    def peek(self):
+        """
+        :return: Next non-whitespace character. Empty string at the end.
+        """
+
+        while True:
+            self.__pos = self.__re_whitespace.match(
+                self.__buf, self.__pos).end()
+            if self.__pos < len(self.__buf):
+                return self.__buf[self.__pos]
+
+            if not self.__fill():
+                return ""
+
+    def expect(self, char):
+        actual = self.peek()
+        if actual != char:
+            raise _make_decode_error(
+                "expected '%s', but got '%s'" % (char, actual))
+
+        self.__pos += 1
+
+    def decode_value(self):
+        self.peek()
+        self.__text_list = []
+        self.__text_start = self.__pos
+        try:
+            self.__scan_value()
+            self.__text_list.append(
+                self.__buf[self.__text_start:self.__pos])
+            value_text = "".join(self.__text_list)
+        finally:
+            self.__text_list = None
+
+        try:
+            return self.__decode_func(value_text)
+        except ValueError:
+            _, e, _ = sys.exc_info()  # for python 2.5 compatibility
+            raise _make_decode_error(e)
+
+    def read_key(self):
+        if self.peek() != '"':
+            raise _make_decode_error("expected object key")
+
+        key = self.decode_value()
+        self.expect(":")
+
+        return key
+
+    def iter_array(self):
+        """
+        Yield for each element of the array at the current position.
+        The caller should consume the element in each iteration.
+        """
+
+        self.expect("[")
+        if self.peek() == "]":
+            self.__pos += 1
+            return
+
+        while True:
+            yield
+
+            char = self.peek()
+            self.__pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise _make_decode_error(
+                    "expected ',' or ']', but got '%s'" % (char))
+
+    def iter_object(self):
+        """
+        Yield the key of each member of the object at the current position.
+        The caller should consume the member value in each iteration.
+        """
+
+        self.expect("{")
+        if self.peek() == "}":
+            self.__pos += 1
+            return
+
+        while True:
+            yield self.read_key()
+
+            char = self.peek()
+            self.__pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise _make_decode_error(
+                    "expected ',' or '}', but got '%s'" % (char))
+
+    def find_path(self, item_path):
+        """
+        Move to the value of the path from the current position.
+
+        :param list item_path: Object keys and/or array indices.
+        :raises KeyError: the path not found.
+        """
+
+        for key in item_path:
+            if isinstance(key, six.string_types):
+                self.__find_key(key)
+            else:
+                self.__find_index(key)
+
+    def __find_key(self, key):
+        for member_key in self.iter_object():
+            if member_key == key:
+                return
+
+            self.skip_value()
+
+        raise KeyError(key)
+
+    def __find_index(self, index):
+        i = 0
+        for _ in self.iter_array():
+            if i == index:
+                return
+
+            self.skip_value()
+            i += 1
+
+        raise KeyError(index)
+
+    def skip_value(self):
+        self.__scan_value()
+
+    def __fill(self):
+        if self.__eof:
+            return False
+
+        chunk = self.__fp.read(self.__CHUNK_SIZE)
+        if not chunk:
+            self.__eof = True
+            return False
+
+        if self.__text_list is not None:
+            # keep the text of the value being decoded
+            self.__text_list.append(
+                self.__buf[self.__text_start:self.__pos])
+            self.__text_start = 0
+
+        # the consumed text is dropped
+        self.__buf = self.__buf[self.__pos:] + chunk
+        self.__pos = 0
+
+        return True
+
+    def __scan_value(self):
+        """
+        Move to the end of the value at the current position.
+        The scanning state is kept across fills and the consumed text is
+        dropped on each fill, so skipped values are never held in memory
+        (only decode_value keeps the text of the value).
+        """
+
+        char = self.peek()
+        if char == "":
+            raise _make_decode_error("unexpected end of JSON")
+
+        if char not in '[{"':
+            while True:
+                match = self.__re_scalar.match(self.__buf, self.__pos)
+                self.__pos = match.end()
+                if self.__pos < len(self.__buf) or not self.__fill():
+                    return
+
+        depth = 0
+        is_in_string = False
+
+        if char == '"':
+            self.__pos += 1
+            is_in_string = True
+
+        while True:
+            if is_in_string:
+                # stops before a backslash at the end of the buffer
+                end = self.__re_string_body.match(
+                    self.__buf, self.__pos).end()
+                if end < len(self.__buf) and self.__buf[end] == '"':
+                    self.__pos = end + 1
+                    is_in_string = False
+                    if depth == 0:
+                        return
+                    continue
+
+                self.__pos = end
+                if not self.__fill():
+                    raise _make_decode_error("unterminated string")
+                continue
+
+            end = self.__re_container_body.match(
+                self.__buf, self.__pos).end()
+            self.__pos = end
+            if end == len(self.__buf):
+                if not self.__fill():
+                    raise _make_decode_error("unexpected end of JSON")
+                continue
+
+            char = self.__buf[end]
+            self.__pos = end + 1
+            if char == '"':
+                # the string continues to the next chunk
+                is_in_string = True
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
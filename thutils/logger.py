@@ -36,6 +36,9 @@ class _BaseWriter(object):
     def getLogMessage(self, level, message):
         return self.__MESSAGE_FORMAT % (level, message)
 
+    def is_debug_enabled(self):
+        return False
+
     def writeDebug(self, message):
         raise NotImplementedError()
 
@@ -57,6 +60,9 @@ class _LoggingWriter(_BaseWriter):
     def __init__(self):
         super(_LoggingWriter, self).__init__()
 
+    def is_debug_enabled(self):
+        return logging.getLogger().isEnabledFor(logging.DEBUG)
+
     def writeDebug(self, message):
         logging.debug(message)
 
@@ -106,6 +112,34 @@ class _StdWriter(_BaseWriter):
         sys.stderr.write(message)
 
 
+class CachedTimeFormatter(logging.Formatter):
+    """
+    logging.Formatter that caches the formatted asctime per second.
+    """
+
+    __DEFAULT_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self, fmt=None, datefmt=None):
+        from thutils.gtime import DateTimeFormatter
+
+        logging.Formatter.__init__(self, fmt, datefmt)
+
+        if datefmt is None:
+            datefmt = self.__DEFAULT_DATETIME_FORMAT
+        self.__time_formatter = DateTimeFormatter(datefmt)
+
+    def formatTime(self, record, datefmt=None):
+        # truncate to the second as logging does: record.msecs belongs to
+        # the truncated second (format_epoch rounds to the microsecond)
+        asctime = self.__time_formatter.format_epoch(int(record.created))
+
+        if datefmt is None:
+            # same as the default format of logging.Formatter
+            asctime = "%s,%03d" % (asctime, record.msecs)
+
+        return asctime
+
+
 class logger:
     '''
     classdocs
@@ -166,6 +200,8 @@ class logger:
             }
             cls.debug("log file path: " + log_file_path)
             logging.basicConfig(**args)
+            cls.__set_cached_time_formatter(
+                log_file_path, args["format"], args["datefmt"])
 
             # define a Handler which writes INFO messages or higher to the
             # sys.stderr
@@ -224,6 +260,10 @@ class logger:
 
     @classmethod
     def debug(cls, msg, caller=None):
+        if not cls.__writer.is_debug_enabled():
+            # skip building the message
+            return
+
         if caller is None:
             caller = logging.getLogger().findCaller()
 
@@ -272,6 +312,18 @@ class logger:
             logging.error(cls.__TRACEBACK_FORMAT %
                           (str(traceback.print_exc())))
 
+    @staticmethod
+    def __set_cached_time_formatter(log_file_path, log_format, datefmt):
+        log_file_path = os.path.abspath(log_file_path)
+
+        for handler in logging.getLogger().handlers:
+            if not isinstance(handler, logging.FileHandler):
+                continue
+            if handler.baseFilename != log_file_path:
+                continue
+
+            handler.setFormatter(CachedTimeFormatter(log_format, datefmt))
+
     @staticmethod
     def __get_message(caller_info_list, msg):
         file_path, line_no, func_name = caller_info_list[:3]
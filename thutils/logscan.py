@@ -0,0 +1,408 @@
+# encoding: utf-8
+
+'''
+@author: Tsuyoshi Hombashi
+'''
+
+from __future__ import with_statement
+import collections
+import datetime
+import mmap
+import os
+import re
+
+import six
+
+import thutils.gfile as gfile
+from thutils.gtime import DateTimeParser
+from thutils.gtime import Format
+from thutils.gtime import RegularExpression
+
+
+DEFAULT_TIMESTAMP_REGEXP = "%s(?: %s)?" % (
+    RegularExpression.ISO.DATETIME, RegularExpression.ISO.TIMEZONE)
+DEFAULT_TIMESTAMP_FORMAT_LIST = [
+    Format.ISO.DATETIME_WITH_TZ,
+    Format.ISO.DATETIME,
+]
+
+_NEWLINE = six.b("\n")
+
+# the parallel scans split a file into at least _CHUNK_PER_WORKER chunks
+# per worker, and into chunks of at most _CHUNK_SIZE_LIMIT bytes
+# (excluding a line longer than the limit)
+_CHUNK_PER_WORKER = 4
+_CHUNK_SIZE_LIMIT = 16 * 1024 ** 2
+
+
+def _open_mmap(fp):
+    if os.fstat(fp.fileno()).st_size == 0:
+        # empty file can not be mapped
+        return None
+
+    return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _iter_match_timestamp(mm, re_timestamp, parser, start_offset, end_offset):
+    for match in re_timestamp.finditer(mm, start_offset, end_offset):
+        try:
+            dt = parser.parse(match.group().decode("ascii"))
+        except ValueError:
+            # matched the pattern, but not a valid datetime
+            continue
+
+        yield (match.start(), dt)
+
+
+def _scan_chunk(arg_list):
+    file_path, regexp_text, format_list, start_offset, end_offset = arg_list
+
+    re_timestamp = re.compile(regexp_text.encode("ascii"))
+    parser = DateTimeParser(format_list)
+
+    with open(file_path, "rb") as fp:
+        mm = _open_mmap(fp)
+        if mm is None:
+            return []
+
+        try:
+            return list(_iter_match_timestamp(
+                mm, re_timestamp, parser, start_offset, end_offset))
+        finally:
+            mm.close()
+
+
+class TimestampScanner(object):
+    """
+    Scan timestamps in a file by compiled byte-level regular expression
+    over memory-mapped file, without decoding the whole file.
+
+    :param str regexp_text: Regular expression of timestamps.
+        Defaults to RegularExpression.ISO.DATETIME with optional
+        RegularExpression.ISO.TIMEZONE.
+    :param list format_list: Datetime formats of the matched timestamps.
+    """
+
+    @property
+    def regexp_text(self):
+        return self.__regexp_text
+
+    def __init__(self, regexp_text=None, format_list=None):
+        if regexp_text is None:
+            regexp_text = DEFAULT_TIMESTAMP_REGEXP
+        if format_list is None:
+            format_list = DEFAULT_TIMESTAMP_FORMAT_LIST
+
+        self.__regexp_text = regexp_text
+        self.__format_list = list(format_list)
+        self.__re_timestamp = re.compile(regexp_text.encode("ascii"))
+
+    def iter_timestamp(self, file_path, workers=None):
+        """
+        Yield (byte offset, datetime) pairs of each timestamp
+        found in the file, in order of the offsets.
+        Matches that are not valid datetimes are skipped.
+
+        :param str file_path: Path to the file to be scanned.
+        :param int workers: If greater than 1, split the file at line
+            boundaries and scan the chunks by the process pool.
+        :raises InvalidFilePathError:
+        :raises FileNotFoundError:
+        """
+
+        gfile.check_file_existence(file_path)
+
+        if workers is not None and workers > 1:
+            for timestamp in self.__iter_timestamp_parallel(
+                    file_path, workers):
+                yield timestamp
+
+            return
+
+        parser = DateTimeParser(self.__format_list)
+
+        with open(file_path, "rb") as fp:
+            mm = _open_mmap(fp)
+            if mm is None:
+                return
+
+            try:
+                for timestamp in _iter_match_timestamp(
+                        mm, self.__re_timestamp, parser, 0, len(mm)):
+                    yield timestamp
+            finally:
+                mm.close()
+
+    def __iter_timestamp_parallel(self, file_path, workers):
+        import multiprocessing
+
+        arg_list = [
+            (file_path, self.__regexp_text, self.__format_list,
+             start_offset, end_offset)
+            for start_offset, end_offset
+            in _split_worker_range(file_path, workers)
+        ]
+        if not arg_list:
+            return
+
+        pool = multiprocessing.Pool(min(workers, len(arg_list)))
+        try:
+            for timestamp_list in _imap_bounded(
+                    pool, _scan_chunk, arg_list, workers):
+                for timestamp in timestamp_list:
+                    yield timestamp
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+def split_line_aligned_range(file_path, split_count):
+    """
+    Split a file into byte ranges that begin at the head of a line.
+
+    :return: List of (start offset, end offset) pairs.
+    :rtype: list of tuple
+    """
+
+    if split_count < 1:
+        raise ValueError("split count must be greater than 0")
+
+    file_size = os.path.getsize(file_path)
+    if file_size == 0:
+        return []
+
+    offset_list = [0]
+
+    with open(file_path, "rb") as fp:
+        mm = _open_mmap(fp)
+        try:
+            for i in range(1, split_count):
+                search_offset = max(
+                    file_size * i // split_count, offset_list[-1])
+                newline_offset = mm.find(_NEWLINE, search_offset)
+                if newline_offset < 0:
+                    break
+
+                if newline_offset + 1 < file_size:
+                    offset_list.append(newline_offset + 1)
+        finally:
+            mm.close()
+
+    offset_list.append(file_size)
+
+    return [
+        (start_offset, end_offset)
+        for start_offset, end_offset in zip(offset_list[:-1], offset_list[1:])
+        if start_offset < end_offset
+    ]
+
+
+def _split_worker_range(file_path, workers):
+    """
+    Split a file into line-aligned byte ranges to be processed
+    by a pool of the workers.
+    """
+
+    file_size = os.path.getsize(file_path)
+
+    return split_line_aligned_range(file_path, max(
+        workers * _CHUNK_PER_WORKER,
+        (file_size + _CHUNK_SIZE_LIMIT - 1) // _CHUNK_SIZE_LIMIT))
+
+
+def _imap_bounded(pool, func, arg_list, workers):
+    """
+    Same as pool.imap, except for keeping at most two tasks per worker
+    in flight, so that the results do not pile up in memory
+    when the consumer is slower than the workers.
+    """
+
+    result_queue = collections.deque()
+
+    for arg in arg_list:
+        result_queue.append(pool.apply_async(func, (arg,)))
+        if len(result_queue) >= workers * 2:
+            yield result_queue.popleft().get()
+
+    while result_queue:
+        yield result_queue.popleft().get()
+
+
+def _is_earlier(dt, other):
+    """
+    Compare a timezone-aware datetime and a naive one by the local times
+    (the timezone is ignored), so that naive range bounds match
+    the timestamps of a log written with a UTC offset.
+    """
+
+    if (dt.tzinfo is None) != (other.tzinfo is None):
+        dt = dt.replace(tzinfo=None)
+        other = other.replace(tzinfo=None)
+
+    return dt < other
+
+
+class TimeRangeReader(object):
+    """
+    Read lines within a time range from a file whose lines are
+    (roughly) ordered by timestamps.
+    The first line of the range is found by binary search of byte offsets,
+    so only the pages around the search points and the range itself are
+    read from the file.
+    Lines without timestamp (e.g. continuation lines) follow
+    the preceding line with timestamp.
+    If either of a timestamp and a range bound has no timezone,
+    they are compared by the local times.
+
+    :param str regexp_text: Regular expression of timestamps.
+    :param list format_list: Datetime formats of the matched timestamps.
+    :param float tolerance_second: Acceptable disorder of timestamps.
+        The search starts from ``start - tolerance`` and
+        the reading stops at a timestamp later than ``end + tolerance``.
+    """
+
+    def __init__(self, regexp_text=None, format_list=None, tolerance_second=0):
+        if regexp_text is None:
+            regexp_text = DEFAULT_TIMESTAMP_REGEXP
+        if format_list is None:
+            format_list = DEFAULT_TIMESTAMP_FORMAT_LIST
+
+        self.__re_timestamp = re.compile(regexp_text.encode("ascii"))
+        self.__parser = DateTimeParser(format_list)
+        self.__tolerance = datetime.timedelta(seconds=tolerance_second)
+
+    def search_offset(self, file_path, target_datetime):
+        """
+        :return: Byte offset of the first line that has a timestamp
+            equal to or later than target_datetime.
+            File size if no such line.
+        :rtype: int
+        :raises InvalidFilePathError:
+        :raises FileNotFoundError:
+        """
+
+        gfile.check_file_existence(file_path)
+        target_datetime = self.__to_datetime(target_datetime)
+
+        with open(file_path, "rb") as fp:
+            mm = _open_mmap(fp)
+            if mm is None:
+                return 0
+
+            try:
+                return self.__search_offset(mm, target_datetime)
+            finally:
+                mm.close()
+
+    def iter_line(
+            self, file_path, start_datetime=None, end_datetime=None,
+            encoding=None):
+        """
+        Yield lines those timestamps are within [start, end].
+
+        :param start_datetime: Start of the range. |None| means unbounded.
+        :type start_datetime: datetime.datetime or str
+        :param end_datetime: End of the range. |None| means unbounded.
+        :type end_datetime: datetime.datetime or str
+        :param str encoding: Decode lines by the encoding if specified,
+            otherwise yield lines as bytes.
+        :raises InvalidFilePathError:
+        :raises FileNotFoundError:
+        :raises ValueError: invalid datetime string.
+        """
+
+        start_datetime = self.__to_datetime(start_datetime)
+        end_datetime = self.__to_datetime(end_datetime)
+
+        if start_datetime is None:
+            gfile.check_file_existence(file_path)
+            start_offset = 0
+        else:
+            start_offset = self.search_offset(
+                file_path, start_datetime - self.__tolerance)
+
+        with open(file_path, "rb") as fp:
+            fp.seek(start_offset)
+            is_in_range = True
+
+            for line in fp:
+                dt = self.__get_line_datetime(line, 0, len(line))
+
+                if dt is not None:
+                    if end_datetime is not None:
+                        if _is_earlier(
+                                end_datetime + self.__tolerance, dt):
+                            return
+
+                    is_in_range = all([
+                        start_datetime is None or not _is_earlier(
+                            dt, start_datetime),
+                        end_datetime is None or not _is_earlier(
+                            end_datetime, dt),
+                    ])
+
+                if not is_in_range:
+                    continue
+
+                if encoding is not None:
+                    line = line.decode(encoding)
+
+                yield line
+
+    def __to_datetime(self, value):
+        if value is None or isinstance(value, datetime.datetime):
+            return value
+
+        return DateTimeParser().parse(value)
+
+    def __get_line_datetime(self, buf, start_offset, end_offset):
+        match = self.__re_timestamp.search(buf, start_offset, end_offset)
+        if match is None:
+            return None
+
+        try:
+            return self.__parser.parse(match.group().decode("ascii"))
+        except ValueError:
+            return None
+
+    def __find_timestamp(self, mm, offset):
+        """
+        :return: Timestamp of the first line with timestamp
+            that begins at or after offset. |None| if no such line.
+        """
+
+        file_size = len(mm)
+
+        if offset > 0:
+            newline_offset = mm.find(_NEWLINE, offset - 1)
+            if newline_offset < 0:
+                return (file_size, None)
+            offset = newline_offset + 1
+
+        while offset < file_size:
+            newline_offset = mm.find(_NEWLINE, offset)
+            if newline_offset < 0:
+                newline_offset = file_size
+
+            dt = self.__get_line_datetime(mm, offset, newline_offset)
+            if dt is not None:
+                return (offset, dt)
+
+            offset = newline_offset + 1
+
+        return (file_size, None)
+
+    def __search_offset(self, mm, target_datetime):
+        lo = 0
+        hi = len(mm)
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            _line_offset, dt = self.__find_timestamp(mm, mid)
+
+            if dt is None or not _is_earlier(dt, target_datetime):
+                hi = mid
+            else:
+                lo = mid + 1
+
+        return self.__find_timestamp(mm, lo)[0]
@@ -0,0 +1,292 @@
+# encoding: utf-8
+
+'''
+@author: Tsuyoshi Hombashi
+'''
+
+from __future__ import with_statement
+import math
+import threading
+
+import dataproperty
+
+import thutils.common as common
+
+try:
+    from time import monotonic as _monotonic
+except ImportError:
+    # python 2 does not have a monotonic clock
+    from time import time as _monotonic
+
+
+def _validate_second(second):
+    """
+    same checks as common.sleep_wrapper
+
+    :raises OverflowError: infinite value
+    :raises IOError: NaN value
+    """
+
+    if second == float("inf"):
+        raise OverflowError("time length is too large")
+
+    if dataproperty.is_nan(second):
+        raise IOError("Invalid argument")
+
+    return float(second)
+
+
+class Deadline(object):
+    """
+    Expiration time measured by a monotonic clock.
+
+    :param float timeout_second: Seconds until the deadline expires.
+    """
+
+    @property
+    def timeout_second(self):
+        return self.__timeout_second
+
+    @property
+    def remaining_second(self):
+        return max(self.__expire_time - self.__clock(), 0)
+
+    def __init__(self, timeout_second, dry_run=False, clock=_monotonic):
+        self.__timeout_second = _validate_second(timeout_second)
+        self.__dry_run = dry_run
+        self.__clock = clock
+        self.__expire_time = clock() + self.__timeout_second
+
+    def is_expired(self):
+        return self.remaining_second <= 0
+
+    def sleep(self, sleep_second):
+        """
+        Sleep until the shorter of sleep_second and the deadline.
+
+        :return: Slept seconds.
+        :rtype: float
+        """
+
+        sleep_second = _validate_second(sleep_second)
+
+        return common.sleep_wrapper(
+            min(sleep_second, self.remaining_second), self.__dry_run)
+
+    def wait(self):
+        """
+        Sleep until the deadline expires.
+        """
+
+        return common.sleep_wrapper(self.remaining_second, self.__dry_run)
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket rate limiter.
+
+    Tokens are reserved in advance, so a caller that reserves more tokens
+    than available runs into debt and subsequent callers wait in turn.
+    Use ``reserve`` to get the waiting time without sleeping
+    (e.g. ``await asyncio.sleep(bucket.reserve())``).
+
+    :param float rate: Number of tokens refilled per second.
+    :param float capacity: Maximum number of tokens (burst size).
+        Defaults to ``max(rate, 1)``: one second worth of tokens,
+        and at least one token, so that a rate below one token
+        per second can still acquire a token.
+    """
+
+    @property
+    def rate(self):
+        return self.__rate
+
+    @property
+    def capacity(self):
+        return self.__capacity
+
+    def __init__(self, rate, capacity=None, dry_run=False, clock=_monotonic):
+        self.__rate = _validate_second(rate)
+        if self.__rate <= 0:
+            raise ValueError("rate must be greater than 0")
+
+        if capacity is None:
+            capacity = max(self.__rate, 1)
+        self.__capacity = _validate_second(capacity)
+        if self.__capacity <= 0:
+            raise ValueError("capacity must be greater than 0")
+
+        self.__dry_run = dry_run
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__token = self.__capacity
+        self.__last_time = clock()
+
+    def get_token(self):
+        """
+        :return: Number of currently available tokens.
+            Negative value means the bucket is in debt.
+        :rtype: float
+        """
+
+        with self.__lock:
+            self.__refill()
+            return self.__token
+
+    def reserve(self, token=1):
+        """
+        Reserve tokens without sleeping.
+
+        :return: Seconds to wait until the reserved tokens are available.
+        :rtype: float
+        """
+
+        token = self.__validate_token(token)
+
+        with self.__lock:
+            self.__refill()
+            self.__token -= token
+
+            if self.__token >= 0:
+                return 0
+
+            return -self.__token / self.__rate
+
+    def try_acquire(self, token=1):
+        """
+        Acquire tokens only if they are available immediately.
+
+        :return: |True| if the tokens acquired.
+        :rtype: bool
+        """
+
+        token = self.__validate_token(token)
+
+        with self.__lock:
+            self.__refill()
+            if self.__token < token:
+                return False
+
+            self.__token -= token
+
+        return True
+
+    def acquire(self, token=1):
+        """
+        Acquire tokens, sleep until the tokens are available if needed.
+
+        :return: Slept seconds.
+        :rtype: float
+        """
+
+        return common.sleep_wrapper(self.reserve(token), self.__dry_run)
+
+    def __validate_token(self, token):
+        token = _validate_second(token)
+        if token < 0:
+            raise ValueError("minus token")
+        if token > self.__capacity:
+            raise ValueError(
+                "token exceeds the bucket capacity: token=%s, capacity=%s" % (
+                    token, self.__capacity))
+
+        return token
+
+    def __refill(self):
+        now = self.__clock()
+        elapsed = max(now - self.__last_time, 0)
+        self.__last_time = now
+        self.__token = min(
+            self.__token + elapsed * self.__rate, self.__capacity)
+
+
+class IntervalTicker(object):
+    """
+    Thread-safe fixed interval scheduler.
+
+    Tick times are scheduled from the first tick, not from the end of
+    the previous sleep, so oversleep does not accumulate as drift.
+    Ticks missed by a long running caller are skipped instead of
+    being fired in a burst.
+
+    :param float interval_second: Interval between ticks.
+    """
+
+    @property
+    def interval_second(self):
+        return self.__interval_second
+
+    @property
+    def tick_count(self):
+        return self.__tick_count
+
+    def __init__(self, interval_second, dry_run=False, clock=_monotonic):
+        self.__interval_second = _validate_second(interval_second)
+        if self.__interval_second <= 0:
+            raise ValueError("interval must be greater than 0")
+
+        self.__dry_run = dry_run
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__next_time = None
+        self.__tick_count = 0
+
+    def reset(self):
+        with self.__lock:
+            self.__next_time = None
+            self.__tick_count = 0
+
+    def reserve(self):
+        """
+        Schedule the next tick without sleeping.
+
+        :return: Seconds to wait until the next tick.
+        :rtype: float
+        """
+
+        with self.__lock:
+            now = self.__clock()
+
+            if self.__next_time is None:
+                self.__next_time = now
+            else:
+                self.__next_time += self.__interval_second
+                if self.__next_time < now:
+                    missed = math.ceil(
+                        (now - self.__next_time) / self.__interval_second)
+                    self.__next_time += missed * self.__interval_second
+
+            self.__tick_count += 1
+
+            return max(self.__next_time - now, 0)
+
+    def wait(self):
+        """
+        Sleep until the next tick.
+
+        :return: Slept seconds.
+        :rtype: float
+        """
+
+        return common.sleep_wrapper(self.reserve(), self.__dry_run)
+
+    def iter_tick(self, deadline=None):
+        """
+        Yield tick counts until the deadline expires.
+
+        :param Deadline deadline: Stop iteration when expired.
+            Iterate infinitely if |None|.
+        """
+
+        while True:
+            wait_second = self.reserve()
+            if deadline is not None:
+                if any([
+                    deadline.is_expired(),
+                    wait_second > deadline.remaining_second,
+                ]):
+                    return
+
+            common.sleep_wrapper(wait_second, self.__dry_run)
+
+            yield self.__tick_count
@@ -0,0 +1,341 @@
+# encoding: utf-8
+
+'''
+@author: Tsuyoshi Hombashi
+'''
+
+from __future__ import with_statement
+import collections
+import sys
+import threading
+
+import six
+
+from thutils.common import _is_fork_process
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+
+class SchemaValidator(object):
+    """
+    Validator of JSON documents.
+    Use get_validator to reuse the validators of the same schema.
+
+    :param schema: voluptuous.Schema or a callable that raises an exception
+        for invalid documents. Other objects (e.g. dictionaries) are
+        compiled as voluptuous schema definitions.
+    """
+
+    __MIN_CHUNK_SIZE = 1000
+
+    @property
+    def schema(self):
+        return self.__schema
+
+    def __init__(self, schema):
+        if not callable(schema):
+            import voluptuous
+
+            schema = voluptuous.Schema(schema)
+
+        self.__schema = schema
+        self.__lazy_schema = _LazyDictSchema.make(schema)
+
+    def validate(self, document, workers=None):
+        """
+        :param document: JSON document to be validated.
+        :param int workers: If greater than 1, validate a large array by
+            a process pool in chunks. This requires fork start method and
+            a voluptuous list schema (e.g. Schema([item_schema])),
+            otherwise validate in the current process.
+        :raises voluptuous.Invalid:
+        """
+
+        if workers is not None and workers > 1 and self.__is_chunkable(
+                document, workers):
+            self.__validate_parallel(document, workers)
+        else:
+            self.__schema(document)
+
+    def validate_lazy(self, document):
+        """
+        Validate values of a JSON object on the first access of each key.
+        Keys are validated at this time (required keys and extra keys).
+        Falls back to validate if the schema is not a voluptuous dict
+        schema whose keys are strings.
+
+        :return: LazyValidatedDict or the document validated.
+        :raises voluptuous.Invalid:
+        """
+
+        if self.__lazy_schema is None:
+            self.validate(document)
+
+            return document
+
+        self.__lazy_schema.validate_keys(document)
+
+        return LazyValidatedDict(document, self.__lazy_schema)
+
+    def __is_chunkable(self, document, workers):
+        import voluptuous
+
+        return all([
+            isinstance(self.__schema, voluptuous.Schema),
+            isinstance(self.__schema.schema, list),
+            isinstance(document, list),
+            len(document) >= self.__MIN_CHUNK_SIZE * 2,
+            _is_fork_process(),
+        ])
+
+    def __validate_parallel(self, document, workers):
+        import multiprocessing
+
+        chunk_size = max(
+            -(-len(document) // (workers * 4)), self.__MIN_CHUNK_SIZE)
+        range_list = [
+            (start, min(start + chunk_size, len(document)))
+            for start in range(0, len(document), chunk_size)
+        ]
+
+        # workers inherit the schema and the document by fork,
+        # only the index ranges are sent to the workers
+        pool = multiprocessing.Pool(
+            min(workers, len(range_list)),
+            initializer=_initialize_validation_worker,
+            initargs=(self.__schema, document))
+        try:
+            for e in pool.imap(_validate_chunk, range_list):
+                if e is not None:
+                    raise e
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+class LazyValidatedDict(Mapping):
+    """
+    Read-only view of a JSON object whose values are validated on
+    the first access of each key. See also SchemaValidator.validate_lazy.
+    Membership tests (``key in doc``) do not validate values, while
+    ``doc[key]`` and ``doc.get(key)`` validate the value of the key.
+    """
+
+    def __init__(self, document, lazy_schema):
+        self.__document = document
+        self.__lazy_schema = lazy_schema
+        self.__validated_key_set = set()
+
+    def __getitem__(self, key):
+        value = self.__document[key]
+
+        if key not in self.__validated_key_set:
+            self.__lazy_schema.validate_item(key, value)
+            self.__validated_key_set.add(key)
+
+        return value
+
+    def __contains__(self, key):
+        # membership tests need not validate the value
+        return key in self.__document
+
+    def __iter__(self):
+        return iter(self.__document)
+
+    def __len__(self):
+        return len(self.__document)
+
+    def __repr__(self):
+        return "LazyValidatedDict(%s)" % (repr(self.__document))
+
+    def to_dict(self):
+        """
+        :return: The JSON object after validating all of the values.
+        :rtype: dict
+        :raises voluptuous.Invalid:
+        """
+
+        for key in self.__document:
+            self[key]
+
+        return self.__document
+
+
+class _LazyDictSchema(object):
+    """
+    voluptuous dict schema split into the schemas of each key.
+    """
+
+    @classmethod
+    def make(cls, schema):
+        """
+        :return: |None| if the schema can not be split.
+        """
+
+        try:
+            import voluptuous
+        except ImportError:
+            return None
+
+        if not isinstance(schema, voluptuous.Schema):
+            return None
+        if not isinstance(schema.schema, dict):
+            return None
+
+        key_table = {}
+        required_key_list = []
+
+        for key, value_schema in schema.schema.items():
+            if isinstance(key, (
+                    voluptuous.Remove, voluptuous.Exclusive,
+                    voluptuous.Inclusive)):
+                # constraints among multiple keys
+                return None
+
+            if isinstance(key, voluptuous.Marker):
+                key_name = key.schema
+                is_required = any([
+                    isinstance(key, voluptuous.Required),
+                    schema.required and not isinstance(
+                        key, voluptuous.Optional),
+                ])
+            else:
+                key_name = key
+                is_required = schema.required
+
+            if not isinstance(key_name, six.string_types):
+                return None
+
+            key_table[key_name] = (key, value_schema)
+            if is_required:
+                required_key_list.append(key_name)
+
+        return cls(
+            key_table, required_key_list,
+            schema.extra != voluptuous.PREVENT_EXTRA)
+
+    def __init__(self, key_table, required_key_list, is_allow_extra):
+        self.__key_table = key_table
+        self.__required_key_list = required_key_list
+        self.__is_allow_extra = is_allow_extra
+        self.__item_schema_table = {}
+
+    def validate_keys(self, document):
+        import voluptuous
+
+        if not isinstance(document, dict):
+            raise voluptuous.MultipleInvalid([
+                voluptuous.Invalid("expected a dictionary")])
+
+        error_list = [
+            voluptuous.RequiredFieldInvalid(
+                "required key not provided", [key])
+            for key in self.__required_key_list
+            if key not in document
+        ]
+
+        if not self.__is_allow_extra:
+            error_list.extend([
+                voluptuous.Invalid("extra keys not allowed", [key])
+                for key in document
+                if key not in self.__key_table
+            ])
+
+        if error_list:
+            raise voluptuous.MultipleInvalid(error_list)
+
+    def validate_item(self, key, value):
+        item_schema = self.__get_item_schema(key)
+        if item_schema is None:
+            return
+
+        item_schema({key: value})
+
+    def __get_item_schema(self, key):
+        import voluptuous
+
+        try:
+            return self.__item_schema_table[key]
+        except KeyError:
+            pass
+
+        try:
+            schema_key, value_schema = self.__key_table[key]
+        except KeyError:
+            # extra key
+            item_schema = None
+        else:
+            item_schema = voluptuous.Schema(
+                {schema_key: value_schema}, extra=voluptuous.ALLOW_EXTRA)
+
+        self.__item_schema_table[key] = item_schema
+
+        return item_schema
+
+
+_validation_worker_arg_list = None
+
+
+def _initialize_validation_worker(schema, document):
+    global _validation_worker_arg_list
+
+    _validation_worker_arg_list = (schema, document)
+
+
+def _validate_chunk(index_range):
+    import voluptuous
+
+    schema, document = _validation_worker_arg_list
+    start_index, end_index = index_range
+
+    try:
+        schema(document[start_index:end_index])
+    except voluptuous.MultipleInvalid:
+        _, e, _ = sys.exc_info()  # for python 2.5 compatibility
+
+        # indices of the paths are relative to the chunk
+        for error in e.errors:
+            if error.path and isinstance(error.path[0], int):
+                error.path[0] += start_index
+
+        return e
+
+    return None
+
+
+_VALIDATOR_CACHE_SIZE = 256
+
+_validator_lock = threading.Lock()
+_validator_table = collections.OrderedDict()
+
+
+def get_validator(schema):
+    """
+    Get the validator of the schema. Validators are compiled once and
+    cached by the identity of the schema, so pass the same schema object
+    (e.g. a module level constant) to reuse the validator.
+
+    :rtype: SchemaValidator
+    """
+
+    schema_id = id(schema)
+
+    with _validator_lock:
+        entry = _validator_table.pop(schema_id, None)
+
+        # the schema reference held by the entry prevents reuse of the id
+        if entry is not None and entry[0] is schema:
+            _validator_table[schema_id] = entry
+            return entry[1]
+
+    validator = SchemaValidator(schema)
+
+    with _validator_lock:
+        _validator_table[schema_id] = (schema, validator)
+        while len(_validator_table) > _VALIDATOR_CACHE_SIZE:
+            _validator_table.popitem(last=False)
+
+    return validator